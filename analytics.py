@@ -1,28 +1,40 @@
+import warnings
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
+from data_store import select_country, select_year, to_frame, to_panel
+from correlation import default_correlation_engine
+from instrumentation import instrument_class
+from gini import gini, gini_along_axis, grouped_gini
+from model_cache import default_model_cache
+from outliers import detect_anomalies, robust_z_scores
 
+@instrument_class('analytics')
 class Analytics:
-    def __init__(self):
-        pass
+    def __init__(self, model_cache=None, correlation_engine=None):
+        self.model_cache = model_cache or default_model_cache
+        self.correlation_engine = correlation_engine or default_correlation_engine
     
     def calculate_z_scores(self, data, column):
         mean_val = data[column].mean()
         std_val = data[column].std()
         return (data[column] - mean_val) / std_val
     
+    def calculate_robust_z_scores(self, data, column):
+        values = data[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        return pd.Series(robust_z_scores(values), index=data.index, name=column)
+    
     def get_top_countries(self, data, indicator, year, n=5, ascending=False):
-        year_data = data[data['date'] == year]
+        year_data = select_year(data, year)
         return year_data.nlargest(n, indicator) if not ascending else year_data.nsmallest(n, indicator)
     
     def calculate_growth_rate(self, data, indicator, country, start_year, end_year):
-        start_value = data[(data['country'] == country) & (data['date'] == start_year)][indicator].iloc[0]
-        end_value = data[(data['country'] == country) & (data['date'] == end_year)][indicator].iloc[0]
+        country_data = select_country(data, country)
+        start_value = country_data[country_data['date'] == start_year][indicator].iloc[0]
+        end_value = country_data[country_data['date'] == end_year][indicator].iloc[0]
         return ((end_value - start_value) / start_value) * 100
     
     def get_inequality_stats(self, data, indicator, year):
-        year_data = data[data['date'] == year]
+        year_data = select_year(data, year)
         stats = {
             'mean': year_data[indicator].mean(),
             'median': year_data[indicator].median(),
@@ -33,44 +45,67 @@ class Analytics:
         }
         return stats
     
-    def calculate_gini_coefficient(self, values):
-        sorted_values = np.sort(values)
-        n = len(sorted_values)
-        cumsum = np.cumsum(sorted_values)
-        return (n + 1 - 2 * np.sum(cumsum) / cumsum[-1]) / n
+    def build_yearly_aggregates(self, data, indicators):
+        return self.batch_inequality_stats(data, indicators)
+    
+    def refresh_yearly_aggregates(self, aggregates, data, changes):
+        # Only (year, indicator) cells touched by the change set are recomputed, each from its year slice
+        aggregates = aggregates.copy()
+        indicators = set(aggregates.index.get_level_values('indicator'))
+        affected = changes.loc[changes['indicator'].isin(indicators), ['date', 'indicator']].drop_duplicates()
+        for year, indicator in affected.itertuples(index=False):
+            aggregates.loc[(int(year), indicator), :] = pd.Series(self.get_inequality_stats(data, indicator, year), dtype=np.float64)
+        return aggregates.sort_index()
+    
+    def apply_changes(self, old_data, new_data, changes, aggregates=None):
+        self.model_cache.carry_over(old_data, new_data, changes)
+        self.correlation_engine.carry_over(old_data, new_data, changes)
+        if aggregates is None:
+            return None
+        return self.refresh_yearly_aggregates(aggregates, new_data, changes)
+    
+    def calculate_gini_coefficient(self, values, weights=None, presorted=False):
+        return gini(values, weights, presorted)
     
-    def find_correlations(self, data, indicators, year):
-        year_data = data[data['date'] == year]
-        return year_data[indicators].corr()
+    def calculate_grouped_gini(self, data, indicator, by='date', weight=None):
+        return grouped_gini(to_frame(data), indicator, by, weight)
+    
+    def find_correlations(self, data, indicators, year, method='pearson'):
+        return self.correlation_engine.compute(data, indicators, method).matrix(year)
+    
+    def find_correlations_all_years(self, data, indicators, method='pearson'):
+        return self.correlation_engine.compute(data, indicators, method)
     
     def perform_pca_analysis(self, data, indicators, year):
-        year_data = data[data['date'] == year].copy()
-        
-        scaler = StandardScaler()
-        scaled_data = scaler.fit_transform(year_data[indicators])
-        
-        pca = PCA(n_components=2)
-        pca_result = pca.fit_transform(scaled_data)
+        index, pca, pca_result = self.model_cache.fit_pca(data, indicators, year)
+        year_data = select_year(data, year).loc[index].copy()
         
         year_data['PC1'] = pca_result[:, 0]
         year_data['PC2'] = pca_result[:, 1]
         
         return year_data, pca.explained_variance_ratio_
     
-    def identify_outliers(self, data, indicator, year, threshold=2):
-        year_data = data[data['date'] == year]
-        z_scores = np.abs(self.calculate_z_scores(year_data, indicator))
-        return year_data[z_scores > threshold]
+    def cluster_all_years(self, data, indicators, n_clusters=3):
+        return self.model_cache.fit_all_years(data, indicators, n_clusters)
+    
+    def identify_outliers(self, data, indicator, year, threshold=2, method='zscore'):
+        year_data = select_year(data, year)
+        if method == 'robust':
+            z_scores = self.calculate_robust_z_scores(year_data, indicator)
+        else:
+            z_scores = self.calculate_z_scores(year_data, indicator)
+        return year_data[z_scores.abs().fillna(0) > threshold]
+    
+    def detect_anomalies(self, data, indicators, method='robust', threshold=3.5, jump_threshold=5.0,
+                         mahalanobis=False):
+        return detect_anomalies(data, indicators, method, threshold, jump_threshold, mahalanobis)
     
     def calculate_regional_averages(self, data, indicator, year):
-        year_data = data[data['date'] == year]
-        return year_data.groupby('country')[indicator].mean().sort_values(ascending=False)
+        year_data = select_year(data, year)
+        return year_data.groupby('country', observed=True)[indicator].mean().sort_values(ascending=False)
     
     def get_trend_analysis(self, data, indicator, country, start_year, end_year):
-        country_data = data[
-            (data['country'] == country) & 
-            (data['date'].between(start_year, end_year))
-        ].sort_values('date')
+        country_data = select_country(data, country, start_year, end_year).sort_values('date')
         
         if len(country_data) < 2:
             return None
@@ -84,4 +119,166 @@ class Analytics:
             'start_value': country_data.iloc[0][indicator],
             'end_value': country_data.iloc[-1][indicator],
             'total_change': country_data.iloc[-1][indicator] - country_data.iloc[0][indicator]
-        } 
\ No newline at end of file
+        }
+    
+    def _year_window(self, years, panel, start_year, end_year):
+        keep = (years >= start_year) & (years <= end_year)
+        return years[keep].astype(np.float64), panel[:, keep, :].astype(np.float64)
+    
+    def batch_trend_analysis(self, data, indicators, start_year, end_year):
+        countries, years, panel = to_panel(data, indicators)
+        x, y = self._year_window(years, panel, start_year, end_year)
+        
+        # NaN-aware least squares slope for every (country, indicator) series at once
+        valid = ~np.isnan(y)
+        y0 = np.where(valid, y, 0.0)
+        xs = np.where(valid, x[None, :, None], 0.0)
+        n = valid.sum(axis=1)
+        sx, sy = xs.sum(axis=1), y0.sum(axis=1)
+        sxx, sxy = (xs * xs).sum(axis=1), (xs * y0).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        slope[n < 2] = np.nan
+        
+        has_value = valid.any(axis=1)
+        first = np.take_along_axis(y, valid.argmax(axis=1)[:, None, :], axis=1)[:, 0, :]
+        last_idx = y.shape[1] - 1 - valid[:, ::-1, :].argmax(axis=1)
+        last = np.take_along_axis(y, last_idx[:, None, :], axis=1)[:, 0, :]
+        first[~has_value] = np.nan
+        last[~has_value] = np.nan
+        
+        result = pd.DataFrame({
+            'country': np.repeat(countries, len(indicators)),
+            'indicator': np.tile(indicators, len(countries)),
+            'slope': slope.ravel(),
+            'start_value': first.ravel(),
+            'end_value': last.ravel(),
+            'total_change': (last - first).ravel(),
+            'observations': n.ravel()
+        })
+        result['trend'] = np.select(
+            [result['slope'] > 0, result['slope'] < 0, result['slope'] == 0],
+            ['Increasing', 'Decreasing', 'Stable'],
+            default=None
+        )
+        return result
+    
+    def batch_growth_rates(self, data, indicators, start_year, end_year):
+        countries, years, panel = to_panel(data, indicators)
+        start_pos = np.searchsorted(years, start_year)
+        end_pos = np.searchsorted(years, end_year)
+        if start_pos >= len(years) or years[start_pos] != start_year or end_pos >= len(years) or years[end_pos] != end_year:
+            return pd.DataFrame(np.nan, index=pd.Index(countries, name='country'), columns=indicators)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            start = panel[:, start_pos, :].astype(np.float64)
+            growth = (panel[:, end_pos, :] - start) / start * 100
+        return pd.DataFrame(growth, index=pd.Index(countries, name='country'), columns=indicators)
+    
+    def batch_inequality_stats(self, data, indicators):
+        countries, years, panel = to_panel(data, indicators)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            stats = {
+                # The panel is float32; accumulate in float64
+                'mean': np.nanmean(panel, axis=0, dtype=np.float64),
+                'median': np.nanmedian(panel, axis=0),
+                'std': np.nanstd(panel, axis=0, dtype=np.float64, ddof=1),
+                'min': np.nanmin(panel, axis=0),
+                'max': np.nanmax(panel, axis=0),
+                'gini': gini_along_axis(panel, axis=0)
+            }
+        index = pd.MultiIndex.from_product([years.astype(int), indicators], names=['date', 'indicator'])
+        return pd.DataFrame({name: values.ravel().astype(np.float64) for name, values in stats.items()}, index=index)
+    
+    def _panel_to_long(self, countries, years, indicators, **arrays):
+        # Rows run indicator-major, then year, then country, so an (indicator, date) index is already sorted
+        shape = (len(countries), len(years), len(indicators))
+        table = pd.DataFrame({
+            'indicator': np.repeat(indicators, shape[1] * shape[0]),
+            'date': np.tile(np.repeat(years.astype(int), shape[0]), shape[2]),
+            'country': np.tile(countries, shape[2] * shape[1])
+        })
+        for name, values in arrays.items():
+            table[name] = values.transpose(2, 1, 0).reshape(-1).astype(np.float64, copy=False)
+        return table
+    
+    def _rolling_mean_panel(self, panel, window, min_periods=1):
+        # Cumulative sums along years give every window's sum and count in O(1)
+        valid = ~np.isnan(panel)
+        padding = np.zeros((panel.shape[0], 1, panel.shape[2]))
+        sums = np.concatenate([padding, np.cumsum(np.where(valid, panel, 0.0), axis=1, dtype=np.float64)], axis=1)
+        counts = np.concatenate([padding, np.cumsum(valid, axis=1)], axis=1)
+        stop = np.arange(1, panel.shape[1] + 1)
+        start = np.maximum(stop - window, 0)
+        window_sums = sums[:, stop, :] - sums[:, start, :]
+        window_counts = counts[:, stop, :] - counts[:, start, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(window_counts >= min_periods, window_sums / window_counts, np.nan)
+    
+    def _min_rank_panel(self, panel):
+        # Ranks along countries, as scipy's rankdata(method='min'): ties share the lowest rank, NaNs stay NaN
+        order = np.argsort(panel, axis=0, kind='stable')
+        ordered = np.take_along_axis(panel, order, axis=0)
+        starts = np.ones(ordered.shape, dtype=bool)
+        starts[1:] = ordered[1:] != ordered[:-1]
+        positions = np.arange(1, panel.shape[0] + 1, dtype=np.float64).reshape(-1, *([1] * (panel.ndim - 1)))
+        sorted_ranks = np.maximum.accumulate(np.where(starts, positions, 0.0), axis=0)
+        ranks = np.empty(panel.shape)
+        np.put_along_axis(ranks, order, sorted_ranks, axis=0)
+        ranks[np.isnan(panel)] = np.nan
+        return ranks
+    
+    def build_panel_tables(self, data, indicators, window=5, ascending=False):
+        indicators = sorted(indicators)
+        countries, years, panel = to_panel(data, indicators)
+        
+        # Windows and lags are in calendar years: spread the panel onto a gap-free year axis first
+        calendar = np.arange(years[0], years[-1] + 1) if len(years) else years
+        grid = np.searchsorted(calendar, years)
+        full = np.full((panel.shape[0], len(calendar), panel.shape[2]), np.nan)
+        full[:, grid, :] = panel
+        rolling_mean = self._rolling_mean_panel(full, window)[:, grid, :]
+        
+        # CAGR over the trailing window, defined only for positive start and end values
+        lagged = np.full(full.shape, np.nan)
+        if window < full.shape[1]:
+            lagged[:, window:, :] = full[:, :-window, :]
+        lagged = lagged[:, grid, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cagr = np.where((lagged > 0) & (panel > 0), (panel / lagged) ** (1.0 / window) - 1, np.nan)
+        
+        # Rank 1 is the highest value unless ascending; ties share the lowest rank
+        ranks = self._min_rank_panel(panel if ascending else -panel)
+        previous = np.full(full.shape, np.nan)
+        previous[:, grid, :] = ranks
+        rank_change = np.full_like(ranks, np.nan)
+        has_previous = grid > 0
+        rank_change[:, has_previous, :] = previous[:, grid[has_previous] - 1, :] - ranks[:, has_previous, :]
+        
+        panel_table = self._panel_to_long(
+            countries, years, indicators,
+            value=panel, rolling_mean=rolling_mean, cagr=cagr, rank=ranks, rank_change=rank_change
+        ).dropna(subset=['value', 'rolling_mean'], how='all').set_index(['indicator', 'date'], drop=False)
+        
+        rolling_gini = gini_along_axis(rolling_mean, axis=0)
+        gini_table = pd.DataFrame(rolling_gini, index=pd.Index(years.astype(int), name='date'), columns=indicators)
+        return {'panel': panel_table, 'rolling_gini': gini_table, 'window': window}
+    
+    def _panel_rows(self, tables, indicator, start_year=None, end_year=None):
+        # Binary search on the sorted (indicator, date) index instead of masking the whole table
+        panel_table = tables['panel']
+        start = (indicator,) if start_year is None else (indicator, start_year)
+        end = (indicator,) if end_year is None else (indicator, end_year)
+        first, last = panel_table.index.slice_locs(start, end)
+        return panel_table.iloc[first:last]
+    
+    def get_biggest_movers(self, tables, indicator, year, n=5):
+        year_table = self._panel_rows(tables, indicator, year, year).dropna(subset=['rank_change'])
+        return {
+            'risers': year_table.nlargest(n, 'rank_change'),
+            'fallers': year_table.nsmallest(n, 'rank_change')
+        }
+    
+    def get_rank_history(self, tables, indicator, countries, start_year=None, end_year=None):
+        history = self._panel_rows(tables, indicator, start_year, end_year)
+        return history[history['country'].isin(countries)]
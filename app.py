@@ -1,9 +1,10 @@
+import os
 import streamlit as st
-import pandas as pd
-import numpy as np
-from data_loader import DataLoader
-from visualizations import Visualizations
-from analytics import Analytics
+from instrumentation import metrics, timed
+
+# pandas and plotly are imported inside the cached loaders below, so the page shell renders
+# before the heavy modules load; scipy.stats and scikit-learn only load once clustering or the
+# anomaly scan is switched on
 
 st.set_page_config(
     page_title="Global Inequality Dashboard",
@@ -12,22 +13,343 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-@st.cache_data
-def load_data():
-    loader = DataLoader()
-    return loader.load_data()
+MAP_INDICATORS = {
+    'GDP per Capita': 'gdp_per_capita',
+    'Gini Index': 'gini_index',
+    'Life Expectancy': 'life_expectancy',
+    'Literacy Rate': 'literacy_rate',
+    'Education Spending': 'education_spending'
+}
+
+def shared_data_generation():
+    # Replicas re-attach once another process republishes the shared dataset (new source or refresh)
+    shared_path = os.environ.get('INEQUALITY_SHARED_DATA')
+    if not shared_path:
+        return None
+    from shared_store import shared_generation
+
+    return shared_generation(shared_path)
+
+def make_loader():
+    from data_loader import DataLoader
+
+    # Point replicas at one shared directory to reuse a warm on-disk indicator cache
+    return DataLoader(cache_dir=os.environ.get('INEQUALITY_CACHE_DIR'), wdi_dir=os.environ.get('INEQUALITY_WDI_DIR'))
+
+@st.cache_resource(max_entries=1)
+def load_data(generation=None):
+    loader = make_loader()
+    source = os.environ.get('INEQUALITY_DATA_SOURCE', 'sample')
+    # With several server processes per host, share one memory-mapped copy of the dataset
+    shared_path = os.environ.get('INEQUALITY_SHARED_DATA')
+    if shared_path:
+        return loader.load_shared_data(shared_path, source=source, generation=generation)
+    return loader.load_data(source=source)
+
+def refresh_shared_data():
+    # Republishes under a new generation when anything changed; every replica applies it on its next run
+    shared_path = os.environ['INEQUALITY_SHARED_DATA']
+    source = os.environ.get('INEQUALITY_DATA_SOURCE', 'sample')
+    _, changes = make_loader().refresh(f"{shared_path}.snapshot.parquet", source, shared_path)
+    return changes
+
+@st.cache_resource
+def data_history():
+    # The store and yearly table this process served last, so a new data version is applied as a change set
+    return {}
+
+@st.cache_resource(max_entries=1)
+def apply_data_changes(_store, version):
+    # Runs once per version before any tab renders: fits and correlations for unchanged years carry over,
+    # and only the changed cells of the yearly table are recomputed
+    history = data_history()
+    previous, yearly = history.get('store'), history.get('yearly')
+    history.clear()
+    history['store'] = _store
+    if previous is None or previous.version == version:
+        return None
+    changes = make_loader().diff_snapshots(previous, _store)
+    yearly = get_analytics().apply_changes(previous, _store, changes, yearly)
+    if yearly is not None:
+        history['yearly'] = yearly
+    return changes
+
+@st.cache_resource(max_entries=1)
+def load_insight_tables(_store, version, window=5):
+    # Precomputed once per data version; the Insights tab only reads from these tables
+    analytics = get_analytics()
+    indicators = list(MAP_INDICATORS.values())
+    tables = analytics.build_panel_tables(_store, indicators, window)
+    history = data_history()
+    if 'yearly' not in history:
+        history['yearly'] = analytics.build_yearly_aggregates(_store, indicators)
+    tables['yearly'] = history['yearly']
+    return tables
+
+@st.cache_resource(max_entries=1)
+def load_anomalies(_store, version):
+    from data_loader import DataLoader
+
+    return DataLoader().screen_anomalies(_store, mahalanobis=True)
+
+@st.cache_resource
+def get_visualizations():
+    from visualizations import Visualizations
+
+    return Visualizations()
+
+@st.cache_resource
+def get_analytics():
+    from analytics import Analytics
+
+    return Analytics()
+
+def format_stat(value, spec):
+    # NaN is the only value not equal to itself
+    return "n/a" if value != value else format(value, spec)
+
+@st.fragment
+@timed('render.overview')
+def render_overview(store, viz, selected_countries):
+    st.header("Global Inequality Overview")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Economic Indicators")
+        economic_indicators = ['gdp_per_capita', 'gini_index', 'poverty_rate']
+        selected_economic = st.selectbox("Select Economic Indicator", economic_indicators)
+        
+        fig_economic = viz.create_time_series_chart(
+            store, selected_economic, selected_countries,
+            f"{selected_economic.replace('_', ' ').title()} Over Time"
+        )
+        st.plotly_chart(fig_economic, use_container_width=True)
+    
+    with col2:
+        st.subheader("Health Indicators")
+        health_indicators = ['life_expectancy', 'infant_mortality', 'health_spending']
+        selected_health = st.selectbox("Select Health Indicator", health_indicators)
+        
+        fig_health = viz.create_time_series_chart(
+            store, selected_health, selected_countries,
+            f"{selected_health.replace('_', ' ').title()} Over Time"
+        )
+        st.plotly_chart(fig_health, use_container_width=True)
+    
+    st.subheader("Education Indicators")
+    education_indicators = ['literacy_rate', 'education_spending']
+    selected_education = st.selectbox("Select Education Indicator", education_indicators)
+    
+    fig_education = viz.create_time_series_chart(
+        store, selected_education, selected_countries,
+        f"{selected_education.replace('_', ' ').title()} Over Time"
+    )
+    st.plotly_chart(fig_education, use_container_width=True)
+
+@st.fragment
+@timed('render.maps')
+def render_maps(store, viz, analytics, selected_year, year_range):
+    st.header("Geospatial Analysis")
+    
+    selected_map_indicator = st.selectbox("Select Indicator for Map", list(MAP_INDICATORS.keys()))
+    
+    animate_map = st.checkbox("Animate across the selected year range", key='animate_map')
+    
+    if animate_map:
+        fig_map = viz.create_choropleth_animation(
+            store, MAP_INDICATORS[selected_map_indicator], year_range[0], year_range[1],
+            f"Global {selected_map_indicator} Distribution"
+        )
+    else:
+        fig_map = viz.create_choropleth_map(
+            store, MAP_INDICATORS[selected_map_indicator], selected_year,
+            f"Global {selected_map_indicator} Distribution"
+        )
+    st.plotly_chart(fig_map, use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Top Countries")
+        top_countries = analytics.get_top_countries(
+            store, MAP_INDICATORS[selected_map_indicator], selected_year, 5
+        )
+        st.dataframe(top_countries[['country', MAP_INDICATORS[selected_map_indicator]]])
+    
+    with col2:
+        st.subheader("Bottom Countries")
+        bottom_countries = analytics.get_top_countries(
+            store, MAP_INDICATORS[selected_map_indicator], selected_year, 5, True
+        )
+        st.dataframe(bottom_countries[['country', MAP_INDICATORS[selected_map_indicator]]])
+
+@st.fragment
+@timed('render.analysis')
+def render_analysis(store, viz, selected_year):
+    st.header("Statistical Analysis")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Correlation Analysis")
+        x_indicator = st.selectbox("X-axis", list(MAP_INDICATORS.keys()), key='x')
+        y_indicator = st.selectbox("Y-axis", list(MAP_INDICATORS.keys()), key='y')
+        
+        fig_scatter = viz.create_scatter_plot(
+            store, 
+            MAP_INDICATORS[x_indicator], 
+            MAP_INDICATORS[y_indicator],
+            year=selected_year,
+            title=f"{x_indicator} vs {y_indicator}"
+        )
+        st.plotly_chart(fig_scatter, use_container_width=True)
+    
+    with col2:
+        st.subheader("Correlation Heatmap")
+        selected_indicators = st.multiselect(
+            "Select Indicators for Heatmap",
+            list(MAP_INDICATORS.keys()),
+            default=list(MAP_INDICATORS.keys())[:5]
+        )
+        correlation_method = st.radio("Correlation Method", ['pearson', 'spearman'], horizontal=True, key='corr_method')
+        
+        if selected_indicators:
+            indicator_codes = [MAP_INDICATORS[ind] for ind in selected_indicators]
+            fig_heatmap = viz.create_heatmap(
+                store, indicator_codes, selected_year, method=correlation_method
+            )
+            st.plotly_chart(fig_heatmap, use_container_width=True)
+    
+    st.subheader("Country Clustering")
+    # Off until asked for: fitting the models is what pulls scikit-learn into the process
+    run_clustering = st.checkbox("Run country clustering", key='run_clustering')
+    if not run_clustering:
+        return
+    
+    cluster_indicators = st.multiselect(
+        "Select Indicators for Clustering",
+        list(MAP_INDICATORS.keys()),
+        default=list(MAP_INDICATORS.keys())[:3]
+    )
+    
+    animate_clusters = st.checkbox("Animate clustering across all years", key='animate_clusters')
+    
+    if len(cluster_indicators) >= 2:
+        cluster_codes = [MAP_INDICATORS[ind] for ind in cluster_indicators]
+        if animate_clusters:
+            fig_cluster = viz.create_cluster_animation(store, cluster_codes)
+        else:
+            fig_cluster = viz.create_cluster_analysis(
+                store, cluster_codes, selected_year
+            )
+        st.plotly_chart(fig_cluster, use_container_width=True)
+
+@st.fragment
+@timed('render.insights')
+def render_insights(store, viz, analytics, selected_year, year_range, countries):
+    st.header("Insights & Trends")
+    
+    tables = load_insight_tables(store, store.version)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("Inequality Statistics")
+        selected_stat_indicator = st.selectbox("Select Indicator for Statistics", list(MAP_INDICATORS.keys()))
+        
+        stat_indicator = MAP_INDICATORS[selected_stat_indicator]
+        # Years without data (e.g. rows dropped during WDI ingestion) come back as NaN rather than a KeyError
+        stats = tables['yearly'].reindex([(selected_year, stat_indicator)]).iloc[0]
+        rolling_gini = tables['rolling_gini'].reindex(index=[selected_year], columns=[stat_indicator]).iloc[0, 0]
+        
+        st.metric("Mean", format_stat(stats['mean'], '.2f'))
+        st.metric("Median", format_stat(stats['median'], '.2f'))
+        st.metric("Standard Deviation", format_stat(stats['std'], '.2f'))
+        st.metric("Gini Coefficient", format_stat(stats['gini'], '.3f'))
+        st.metric(f"Gini of {tables['window']}-Year Rolling Means", format_stat(rolling_gini, '.3f'))
+    
+    with col2:
+        st.subheader("Trend Analysis")
+        selected_trend_country = st.selectbox("Select Country", countries)
+        selected_trend_indicator = st.selectbox("Select Indicator", list(MAP_INDICATORS.keys()), key='trend')
+        
+        trend_analysis = analytics.get_trend_analysis(
+            store, 
+            MAP_INDICATORS[selected_trend_indicator],
+            selected_trend_country,
+            year_range[0], year_range[1]
+        )
+        
+        if trend_analysis:
+            st.metric("Trend", trend_analysis['trend'])
+            st.metric("Total Change", f"{trend_analysis['total_change']:.2f}")
+            st.metric("Start Value", f"{trend_analysis['start_value']:.2f}")
+            st.metric("End Value", f"{trend_analysis['end_value']:.2f}")
+    
+    st.subheader("Progress Timeline")
+    timeline_countries = st.multiselect("Select Countries for Timeline", countries, default=countries[:3])
+    timeline_indicator = st.selectbox("Select Indicator", list(MAP_INDICATORS.keys()), key='timeline')
+    
+    if timeline_countries:
+        fig_timeline = viz.create_progress_timeline(
+            store,
+            MAP_INDICATORS[timeline_indicator],
+            timeline_countries,
+            year_range[0], year_range[1]
+        )
+        st.plotly_chart(fig_timeline, use_container_width=True)
+    
+    st.subheader("Biggest Movers")
+    movers_indicator = st.selectbox("Select Indicator", list(MAP_INDICATORS.keys()), key='movers')
+    movers = analytics.get_biggest_movers(tables, MAP_INDICATORS[movers_indicator], selected_year)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("**Climbed the most ranks**")
+        st.dataframe(movers['risers'][['country', 'value', 'rank', 'rank_change', 'cagr']])
+    
+    with col2:
+        st.markdown("**Dropped the most ranks**")
+        st.dataframe(movers['fallers'][['country', 'value', 'rank', 'rank_change', 'cagr']])
+    
+    if timeline_countries:
+        rank_history = analytics.get_rank_history(
+            tables, MAP_INDICATORS[timeline_indicator], timeline_countries, year_range[0], year_range[1]
+        )
+        fig_rank = viz.create_rank_chart(rank_history, f"{timeline_indicator} Rank Over Time")
+        st.plotly_chart(fig_rank, use_container_width=True)
+
+def render_debug_panel():
+    rows, counters = metrics.summary()
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        if not rows and not counters:
+            st.caption("No measurements yet")
+            return
+        st.dataframe(rows, hide_index=True)
+        st.dataframe(counters, hide_index=True)
+        st.download_button("Prometheus metrics", metrics.to_prometheus(), file_name="metrics.prom")
+        st.download_button("Span log (JSON lines)", metrics.to_json_lines(), file_name="spans.jsonl")
+        if st.button("Reset measurements"):
+            metrics.reset()
 
 def main():
     st.title("🌍 Global Inequality Dashboard")
     st.markdown("Explore global inequality patterns across economic, education, and health indicators")
     
-    data = load_data()
-    viz = Visualizations()
-    analytics = Analytics()
+    # Shared, read-only handle: cache_resource hands every session the same store without pickling it
+    store = load_data(shared_data_generation())
+    apply_data_changes(store, store.version)
     
     sidebar = st.sidebar
     sidebar.header("📊 Dashboard Controls")
     
+    if os.environ.get('INEQUALITY_SHARED_DATA') and sidebar.button("🔄 Refresh data"):
+        if len(refresh_shared_data()):
+            st.rerun()
+        sidebar.caption("Data is up to date")
+    
     year_range = sidebar.slider(
         "Select Year Range",
         min_value=1980,
@@ -41,185 +363,31 @@ def main():
         index=len(list(range(year_range[0], year_range[1] + 1))) - 1
     )
     
-    countries = data['combined']['country'].unique()
+    countries = store.country_names
     selected_countries = sidebar.multiselect(
         "Select Countries",
         options=countries,
         default=countries[:5]
     )
     
+    viz = get_visualizations()
+    analytics = get_analytics()
+    
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
         "📈 Overview", "🗺️ Maps", "📊 Analysis", "🔍 Insights", "📋 Data"
     ])
     
     with tab1:
-        st.header("Global Inequality Overview")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Economic Indicators")
-            economic_indicators = ['gdp_per_capita', 'gini_index', 'poverty_rate']
-            selected_economic = st.selectbox("Select Economic Indicator", economic_indicators)
-            
-            fig_economic = viz.create_time_series_chart(
-                data['economic'], selected_economic, selected_countries,
-                f"{selected_economic.replace('_', ' ').title()} Over Time"
-            )
-            st.plotly_chart(fig_economic, use_container_width=True)
-        
-        with col2:
-            st.subheader("Health Indicators")
-            health_indicators = ['life_expectancy', 'infant_mortality', 'health_spending']
-            selected_health = st.selectbox("Select Health Indicator", health_indicators)
-            
-            fig_health = viz.create_time_series_chart(
-                data['health'], selected_health, selected_countries,
-                f"{selected_health.replace('_', ' ').title()} Over Time"
-            )
-            st.plotly_chart(fig_health, use_container_width=True)
-        
-        st.subheader("Education Indicators")
-        education_indicators = ['literacy_rate', 'education_spending']
-        selected_education = st.selectbox("Select Education Indicator", education_indicators)
-        
-        fig_education = viz.create_time_series_chart(
-            data['education'], selected_education, selected_countries,
-            f"{selected_education.replace('_', ' ').title()} Over Time"
-        )
-        st.plotly_chart(fig_education, use_container_width=True)
+        render_overview(store, viz, selected_countries)
     
     with tab2:
-        st.header("Geospatial Analysis")
-        
-        map_indicators = {
-            'GDP per Capita': 'gdp_per_capita',
-            'Gini Index': 'gini_index',
-            'Life Expectancy': 'life_expectancy',
-            'Literacy Rate': 'literacy_rate',
-            'Education Spending': 'education_spending'
-        }
-        
-        selected_map_indicator = st.selectbox("Select Indicator for Map", list(map_indicators.keys()))
-        
-        fig_map = viz.create_choropleth_map(
-            data['combined'], map_indicators[selected_map_indicator], selected_year,
-            f"Global {selected_map_indicator} Distribution"
-        )
-        st.plotly_chart(fig_map, use_container_width=True)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Top Countries")
-            top_countries = analytics.get_top_countries(
-                data['combined'], map_indicators[selected_map_indicator], selected_year, 5
-            )
-            st.dataframe(top_countries[['country', map_indicators[selected_map_indicator]]])
-        
-        with col2:
-            st.subheader("Bottom Countries")
-            bottom_countries = analytics.get_top_countries(
-                data['combined'], map_indicators[selected_map_indicator], selected_year, 5, True
-            )
-            st.dataframe(bottom_countries[['country', map_indicators[selected_map_indicator]]])
+        render_maps(store, viz, analytics, selected_year, year_range)
     
     with tab3:
-        st.header("Statistical Analysis")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Correlation Analysis")
-            x_indicator = st.selectbox("X-axis", list(map_indicators.keys()), key='x')
-            y_indicator = st.selectbox("Y-axis", list(map_indicators.keys()), key='y')
-            
-            fig_scatter = viz.create_scatter_plot(
-                data['combined'], 
-                map_indicators[x_indicator], 
-                map_indicators[y_indicator],
-                year=selected_year,
-                title=f"{x_indicator} vs {y_indicator}"
-            )
-            st.plotly_chart(fig_scatter, use_container_width=True)
-        
-        with col2:
-            st.subheader("Correlation Heatmap")
-            selected_indicators = st.multiselect(
-                "Select Indicators for Heatmap",
-                list(map_indicators.keys()),
-                default=list(map_indicators.keys())[:5]
-            )
-            
-            if selected_indicators:
-                indicator_codes = [map_indicators[ind] for ind in selected_indicators]
-                fig_heatmap = viz.create_heatmap(
-                    data['combined'], indicator_codes, selected_year
-                )
-                st.plotly_chart(fig_heatmap, use_container_width=True)
-        
-        st.subheader("Country Clustering")
-        cluster_indicators = st.multiselect(
-            "Select Indicators for Clustering",
-            list(map_indicators.keys()),
-            default=list(map_indicators.keys())[:3]
-        )
-        
-        if len(cluster_indicators) >= 2:
-            cluster_codes = [map_indicators[ind] for ind in cluster_indicators]
-            fig_cluster = viz.create_cluster_analysis(
-                data['combined'], cluster_codes, selected_year
-            )
-            st.plotly_chart(fig_cluster, use_container_width=True)
+        render_analysis(store, viz, selected_year)
     
     with tab4:
-        st.header("Insights & Trends")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Inequality Statistics")
-            selected_stat_indicator = st.selectbox("Select Indicator for Statistics", list(map_indicators.keys()))
-            
-            stats = analytics.get_inequality_stats(
-                data['combined'], map_indicators[selected_stat_indicator], selected_year
-            )
-            
-            st.metric("Mean", f"{stats['mean']:.2f}")
-            st.metric("Median", f"{stats['median']:.2f}")
-            st.metric("Standard Deviation", f"{stats['std']:.2f}")
-            st.metric("Gini Coefficient", f"{stats['gini']:.3f}")
-        
-        with col2:
-            st.subheader("Trend Analysis")
-            selected_trend_country = st.selectbox("Select Country", countries)
-            selected_trend_indicator = st.selectbox("Select Indicator", list(map_indicators.keys()), key='trend')
-            
-            trend_analysis = analytics.get_trend_analysis(
-                data['combined'], 
-                map_indicators[selected_trend_indicator],
-                selected_trend_country,
-                year_range[0], year_range[1]
-            )
-            
-            if trend_analysis:
-                st.metric("Trend", trend_analysis['trend'])
-                st.metric("Total Change", f"{trend_analysis['total_change']:.2f}")
-                st.metric("Start Value", f"{trend_analysis['start_value']:.2f}")
-                st.metric("End Value", f"{trend_analysis['end_value']:.2f}")
-        
-        st.subheader("Progress Timeline")
-        timeline_countries = st.multiselect("Select Countries for Timeline", countries, default=countries[:3])
-        timeline_indicator = st.selectbox("Select Indicator", list(map_indicators.keys()), key='timeline')
-        
-        if timeline_countries:
-            fig_timeline = viz.create_progress_timeline(
-                data['combined'],
-                map_indicators[timeline_indicator],
-                timeline_countries,
-                year_range[0], year_range[1]
-            )
-            st.plotly_chart(fig_timeline, use_container_width=True)
+        render_insights(store, viz, analytics, selected_year, year_range, countries)
     
     with tab5:
         st.header("Data Explorer")
@@ -228,17 +396,28 @@ def main():
         
         with col1:
             st.subheader("Economic Data")
-            st.dataframe(data['economic'])
+            st.dataframe(store.domain('economic'))
         
         with col2:
             st.subheader("Health Data")
-            st.dataframe(data['health'])
+            st.dataframe(store.domain('health'))
         
         st.subheader("Education Data")
-        st.dataframe(data['education'])
+        st.dataframe(store.domain('education'))
         
         st.subheader("Combined Dataset")
-        st.dataframe(data['combined'])
+        st.dataframe(store.domain('combined'))
+        
+        st.subheader("Data Quality")
+        if st.checkbox("Scan for anomalies", key='scan_anomalies'):
+            anomalies = load_anomalies(store, store.version)
+            st.caption(f"{len(anomalies)} flagged cells: robust level outliers, unusual year-over-year jumps "
+                       "and multivariate outliers")
+            st.dataframe(anomalies)
+    
+    # Opt-in: set INEQUALITY_INSTRUMENTATION=1 to time every render and analytic call
+    if metrics.enabled:
+        render_debug_panel()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main() 
\ No newline at end of file
@@ -0,0 +1,245 @@
+import argparse
+import inspect
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+# The app imports these lazily; load them here so the first case timed does not absorb their import
+import scipy.optimize
+import scipy.stats
+import sklearn.cluster
+import sklearn.decomposition
+import sklearn.preprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import Analytics
+from correlation import default_correlation_engine
+from data_loader import DataLoader
+from data_store import DataStore
+from model_cache import default_model_cache
+from tests.conftest import make_frame
+from visualizations import Visualizations, figure_cache
+
+SCALES = {
+    'small': (10, 43, 10),
+    'medium': (100, 60, 100),
+    'large': (250, 100, 1500),
+}
+
+CORE_INDICATORS = [
+    'gdp_per_capita', 'gini_index', 'poverty_rate', 'life_expectancy', 'literacy_rate',
+    'education_spending', 'infant_mortality', 'health_spending'
+]
+
+
+def random_walk(rng, shape, years):
+    # Country level plus a random walk over years
+    return rng.uniform(1, 100, size=(shape[0], 1, shape[2])) + rng.normal(0, 1, size=shape).cumsum(axis=1)
+
+
+def make_synthetic_data(n_countries=10, n_years=43, n_indicators=10, seed=0, start_year=1980):
+    names = CORE_INDICATORS[:n_indicators] + [f"indicator_{i:04d}" for i in range(max(n_indicators - len(CORE_INDICATORS), 0))]
+    return make_frame(names, n_countries, range(start_year, start_year + n_years), values=random_walk, missing=0.05,
+                      seed=seed, dtype=np.float32)
+
+
+class SyntheticLoader(DataLoader):
+    def __init__(self, n_countries, n_years, n_indicators, **kwargs):
+        super().__init__(**kwargs)
+        self.shape = (n_countries, n_years, n_indicators)
+
+    def create_sample_data(self):
+        return make_synthetic_data(*self.shape)
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'peak_mem_bytes': peak
+    }
+
+
+def cold(func, store):
+    # Bypass figure memoization, cached model fits, correlations and the store's panel so every run measures a full build
+    def run():
+        figure_cache.clear()
+        default_model_cache.models.clear()
+        default_correlation_engine.results.clear()
+        store._panel = None
+        return func()
+    return run
+
+
+def build_cases(store, loader):
+    analytics = Analytics()
+    viz = Visualizations()
+    indicators = store.indicators
+    year = int(store.years[len(store.years) // 2])
+    first_year, last_year = int(store.years[0]), int(store.years[-1])
+    country = store.country_names[0]
+    countries = store.country_names[:5]
+    ind = indicators[0]
+    pair = indicators[:2]
+    few = indicators[:5]
+    many = indicators[:100]
+    year_frame = store.year(year)
+
+    # Inputs for the Insights readers and the refresh path, built once outside the timings
+    tables = analytics.build_panel_tables(store, few)
+    aggregates = analytics.build_yearly_aggregates(store, few)
+    rank_history = analytics.get_rank_history(tables, ind, countries)
+    changed = store.frame.copy()
+    changed.loc[changed['date'] == last_year, ind] *= 1.1
+    new_store = DataStore(changed, store.domains)
+    changes = loader.diff_snapshots(store, new_store)
+
+    def apply_changes():
+        # Carry-over cost for one cached correlation result and clustering; the first repeat also fits them
+        analytics.find_correlations(store, few, year)
+        default_model_cache.fit_kmeans(store, few[:3], year)
+        return analytics.apply_changes(store, new_store, changes, aggregates)
+
+    def figure(name, *args, data=store, **kwargs):
+        method = inspect.unwrap(getattr(Visualizations, name))
+        return cold(lambda: method(viz, data, *args, **kwargs), store)
+
+    return {
+        'loader.load_data': lambda: loader.load_data(),
+        'loader.diff_snapshots': lambda: loader.diff_snapshots(store, new_store),
+        'analytics.calculate_z_scores': lambda: analytics.calculate_z_scores(year_frame, ind),
+        'analytics.calculate_robust_z_scores': lambda: analytics.calculate_robust_z_scores(year_frame, ind),
+        'analytics.calculate_gini_coefficient': lambda: analytics.calculate_gini_coefficient(year_frame[ind]),
+        'analytics.calculate_grouped_gini': lambda: analytics.calculate_grouped_gini(store, ind),
+        'analytics.get_top_countries': lambda: analytics.get_top_countries(store, ind, year),
+        'analytics.calculate_growth_rate': lambda: analytics.calculate_growth_rate(store, ind, country, first_year, last_year),
+        'analytics.get_inequality_stats': lambda: analytics.get_inequality_stats(store, ind, year),
+        'analytics.find_correlations': cold(lambda: analytics.find_correlations(store, few, year), store),
+        'analytics.find_correlations[spearman]': cold(lambda: analytics.find_correlations(store, few, year, 'spearman'), store),
+        # Pairwise-complete Spearman re-ranks pairs, so its cost grows with the square of the indicator count
+        'analytics.find_correlations[many]': cold(lambda: analytics.find_correlations(store, many, year), store),
+        'analytics.find_correlations[spearman,many]': cold(lambda: analytics.find_correlations(store, many, year, 'spearman'), store),
+        'analytics.find_correlations_all_years': cold(lambda: analytics.find_correlations_all_years(store, few), store),
+        'analytics.perform_pca_analysis': cold(lambda: analytics.perform_pca_analysis(store, few, year), store),
+        'analytics.identify_outliers': lambda: analytics.identify_outliers(store, ind, year),
+        'analytics.calculate_regional_averages': lambda: analytics.calculate_regional_averages(store, ind, year),
+        'analytics.get_trend_analysis': lambda: analytics.get_trend_analysis(store, ind, country, first_year, last_year),
+        'analytics.batch_trend_analysis': cold(lambda: analytics.batch_trend_analysis(store, indicators, first_year, last_year), store),
+        'analytics.batch_growth_rates': cold(lambda: analytics.batch_growth_rates(store, indicators, first_year, last_year), store),
+        'analytics.batch_inequality_stats': cold(lambda: analytics.batch_inequality_stats(store, indicators), store),
+        # What the app computes per page: Insights tables, Data tab screening, animated clustering
+        'analytics.build_panel_tables': cold(lambda: analytics.build_panel_tables(store, few), store),
+        'analytics.build_yearly_aggregates': cold(lambda: analytics.build_yearly_aggregates(store, few), store),
+        'analytics.detect_anomalies': cold(lambda: analytics.detect_anomalies(store, indicators, mahalanobis=True), store),
+        'analytics.cluster_all_years': cold(lambda: analytics.cluster_all_years(store, few[:3]), store),
+        'analytics.get_biggest_movers': lambda: analytics.get_biggest_movers(tables, ind, year),
+        'analytics.get_rank_history': lambda: analytics.get_rank_history(tables, ind, countries),
+        'analytics.refresh_yearly_aggregates': lambda: analytics.refresh_yearly_aggregates(aggregates, new_store, changes),
+        'analytics.apply_changes': apply_changes,
+        'viz.create_time_series_chart': figure('create_time_series_chart', ind, countries),
+        'viz.create_time_series_chart[all]': figure('create_time_series_chart', ind),
+        'viz.create_percentile_band_chart': figure('create_percentile_band_chart', ind),
+        'viz.create_choropleth_map': figure('create_choropleth_map', ind, year),
+        'viz.create_choropleth_animation': figure('create_choropleth_animation', ind, first_year, last_year),
+        'viz.create_scatter_plot': figure('create_scatter_plot', pair[0], pair[-1], year=year),
+        'viz.create_scatter_plot[all]': figure('create_scatter_plot', pair[0], pair[-1]),
+        'viz.create_bar_chart': figure('create_bar_chart', 'country', ind, data=year_frame),
+        'viz.create_heatmap': figure('create_heatmap', few, year),
+        'viz.create_cluster_analysis': figure('create_cluster_analysis', few[:3], year),
+        'viz.create_cluster_animation': figure('create_cluster_animation', few[:3]),
+        'viz.create_comparison_chart': figure('create_comparison_chart', ind, countries, [first_year, last_year]),
+        'viz.create_progress_timeline': figure('create_progress_timeline', ind, countries, first_year, last_year),
+        'viz.create_rank_chart': figure('create_rank_chart', data=rank_history),
+    }
+
+
+def run_scale(n_countries, n_years, n_indicators, repeat, only=None):
+    loader = SyntheticLoader(n_countries, n_years, n_indicators)
+    store = loader.load_data()
+    results = {}
+    for name, func in build_cases(store, loader).items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        result, stats = measure(func, repeat)
+        if name.startswith('viz.'):
+            stats['payload_bytes'] = len(result.to_json())
+        results[name] = stats
+        print(f"  {name:45s} {stats['median_s'] * 1000:10.2f} ms  {stats['peak_mem_bytes'] / 1e6:8.2f} MB"
+              + (f"  {stats['payload_bytes'] / 1e3:9.1f} kB" if 'payload_bytes' in stats else ''))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for scale, cases in results.items():
+        for name, stats in cases.items():
+            before = baseline.get('results', {}).get(scale, {}).get(name)
+            if before is None:
+                continue
+            for metric in ('median_s', 'peak_mem_bytes', 'payload_bytes'):
+                if metric in stats and before.get(metric) and stats[metric] > before[metric] * tolerance:
+                    regressions.append((scale, name, metric, before[metric], stats[metric]))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark loader, analytics and visualization hot paths")
+    parser.add_argument('--scales', default='small,medium',
+                        help="Comma separated presets (%s) or CxYxI triples such as 250x100x1500" % ', '.join(SCALES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='*', help="Run only cases whose name contains one of these substrings")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    parser.add_argument('--baseline', help="Compare against a previous JSON results file")
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help="Allowed ratio against the baseline before a case counts as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {}
+    for scale in args.scales.split(','):
+        shape = SCALES.get(scale) or tuple(int(part) for part in scale.split('x'))
+        label = scale if scale in SCALES else 'x'.join(map(str, shape))
+        print(f"{label}: {shape[0]} countries x {shape[1]} years x {shape[2]} indicators")
+        results[label] = run_scale(*shape, repeat=args.repeat, only=args.only)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for scale, name, metric, before, after in regressions:
+            print(f"REGRESSION {scale} {name} {metric}: {before:.4g} -> {after:.4g}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['app', 'data_loader', 'analytics', 'visualizations', 'model_cache', 'correlation', 'outliers', 'data_store']
+
+FIRST_RUN = (
+    "import time; start = time.perf_counter(); "
+    "from streamlit.testing.v1 import AppTest; "
+    "at = AppTest.from_file('app.py', default_timeout=600).run(); "
+    "print(time.perf_counter() - start, len(at.exception))"
+)
+
+
+def parse_importtime(stderr):
+    # Lines look like "import time:  self [us] | cumulative | imported package", nesting shown by indentation
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append({'name': name.strip(), 'depth': depth,
+                        'self_s': int(self_us) / 1e6, 'cumulative_s': int(cumulative_us) / 1e6})
+    return entries
+
+
+def measure_import(module):
+    # A fresh interpreter per sample; anything already imported would hide the cost
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr}")
+    entries = parse_importtime(proc.stderr)
+    position = max(i for i, entry in enumerate(entries) if entry['depth'] == 0 and entry['name'] == module)
+    # Children are printed before their parent, one level deeper
+    children = []
+    for entry in reversed(entries[:position]):
+        if entry['depth'] == 0:
+            break
+        if entry['depth'] == 1:
+            children.append(entry)
+    return entries[position]['cumulative_s'], wall, children
+
+
+def measure_first_run():
+    proc = subprocess.run([sys.executable, '-c', FIRST_RUN], cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"app run failed:\n{proc.stderr}")
+    seconds, exceptions = proc.stdout.split()[-2:]
+    if int(exceptions):
+        raise RuntimeError("app raised during its first run")
+    return float(seconds)
+
+
+def run(modules, repeat, top, first_run=True):
+    results = {}
+    for module in modules:
+        samples = [measure_import(module) for _ in range(repeat)]
+        cumulative = [sample[0] for sample in samples]
+        wall = [sample[1] for sample in samples]
+
+        # Direct imports of this module, heaviest first (from the median sample)
+        median_sample = sorted(samples, key=lambda sample: sample[0])[len(samples) // 2]
+        heaviest = sorted(median_sample[2], key=lambda entry: -entry['cumulative_s'])
+        results[module] = {
+            'median_s': statistics.median(cumulative),
+            'min_s': min(cumulative),
+            'process_wall_s': statistics.median(wall),
+            'heaviest': [[entry['name'], round(entry['cumulative_s'], 4)] for entry in heaviest[:top]]
+        }
+        print(f"  {module:30s} {results[module]['median_s'] * 1000:10.1f} ms import"
+              f"  {results[module]['process_wall_s'] * 1000:10.1f} ms process")
+        for name, seconds in results[module]['heaviest']:
+            print(f"      {name:26s} {seconds * 1000:10.1f} ms")
+
+    if first_run:
+        samples = [measure_first_run() for _ in range(repeat)]
+        results['app.first_run'] = {'median_s': statistics.median(samples), 'min_s': min(samples)}
+        print(f"  {'app.first_run':30s} {results['app.first_run']['median_s'] * 1000:10.1f} ms")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, stats in results.items():
+        before = baseline.get('results', {}).get(name)
+        if before and before.get('median_s') and stats['median_s'] > before['median_s'] * tolerance:
+            regressions.append((name, before['median_s'], stats['median_s']))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold import cost per module and the app's first run")
+    parser.add_argument('--modules', nargs='*', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help="Heaviest top-level imports to list per module")
+    parser.add_argument('--skip-first-run', action='store_true', help="Only measure imports")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    parser.add_argument('--baseline', help="Compare against a previous JSON results file")
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help="Allowed ratio against the baseline before a case counts as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args.modules, args.repeat, args.top, first_run=not args.skip_first_run)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name} median_s: {before:.4g} -> {after:.4g}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
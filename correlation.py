@@ -0,0 +1,219 @@
+import numpy as np
+import pandas as pd
+
+from data_store import data_version, to_panel
+from model_cache import LRUCache
+
+
+def _pearson_from_masked(values):
+    # values is (year, country, indicator) with NaN for missing; each pair uses only countries observed for both
+    mask = (~np.isnan(values)).astype(np.float64)
+    x = np.nan_to_num(values)
+    # Batched matrix products (BLAS) over years: (year, indicator, country) @ (year, country, indicator)
+    mask_t, x_t = np.swapaxes(mask, 1, 2), np.swapaxes(x, 1, 2)
+    n = mask_t @ mask
+    sum_x = x_t @ mask
+    sum_xx = (x_t * x_t) @ mask
+    sum_xy = x_t @ x
+    sum_y = np.swapaxes(sum_x, 1, 2)
+    sum_yy = np.swapaxes(sum_xx, 1, 2)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sum_xy - sum_x * sum_y / n
+        var_x = sum_xx - sum_x * sum_x / n
+        var_y = sum_yy - sum_y * sum_y / n
+        corr = cov / np.sqrt(var_x * var_y)
+    return np.where(n >= 2, np.clip(corr, -1.0, 1.0), np.nan), n
+
+
+def _sorted_layout(values):
+    # Per (year, indicator): country order by value (NaN last), its inverse, and tie-group bounds where values tie
+    n_countries = values.shape[1]
+    order = np.argsort(np.where(np.isnan(values), np.inf, values), axis=1, kind='stable')
+    inverse = np.argsort(order, axis=1, kind='stable')
+    ordered = np.take_along_axis(values, order, axis=1)
+    # Observed values sort first, so a position is observed iff it is below the indicator's count
+    observed = (~np.isnan(values)).sum(axis=1, keepdims=True)
+    positions = np.arange(n_countries).reshape(1, -1, 1)
+    first = np.ones_like(ordered, dtype=bool)
+    first[:, 1:, :] = ordered[:, 1:, :] != ordered[:, :-1, :]
+    tied = (~first & (positions < observed)).any(axis=(0, 1))
+    if not tied.any():
+        return order, inverse, observed, None, None, tied
+    last = np.ones_like(ordered, dtype=bool)
+    last[:, :-1, :] = first[:, 1:, :]
+    starts = np.maximum.accumulate(np.where(first, positions, 0), axis=1)
+    ends = np.flip(np.minimum.accumulate(np.flip(np.where(last, positions, n_countries), axis=1), axis=1), axis=1)
+    return order, inverse, observed, starts, ends, tied
+
+
+def _select(layout, columns):
+    # Tie-group bounds are only carried for selections that actually contain ties
+    order, inverse, observed, starts, ends, tied = layout
+    if starts is None or not tied[columns].any():
+        return order[:, :, columns], inverse[:, :, columns], observed[:, :, columns], None, None
+    return order[:, :, columns], inverse[:, :, columns], observed[:, :, columns], starts[:, :, columns], ends[:, :, columns]
+
+
+def _joint_ranks(layout, partner_valid):
+    # Average ranks within (own mask & partner mask): running counts of kept countries in value order
+    order, inverse, observed, starts, ends = layout
+    positions = np.arange(order.shape[1]).reshape(1, -1, 1)
+    kept = (positions < observed) & np.take_along_axis(partner_valid, order, axis=1)
+    counts = np.cumsum(kept, axis=1, dtype=np.int32)
+    if starts is None:
+        ranks = np.where(kept, counts, np.nan)
+    else:
+        through_group = np.take_along_axis(counts, ends, axis=1)
+        before_group = np.where(starts > 0, np.take_along_axis(counts, np.maximum(starts - 1, 0), axis=1), 0)
+        ranks = np.where(kept, (before_group + 1 + through_group) / 2.0, np.nan)
+    return np.take_along_axis(ranks, inverse, axis=1)
+
+
+def _rerank_pairs(values, valid, corr, needs):
+    # Spearman on a pair must rank each indicator within that pair's jointly observed countries only
+    layout = _sorted_layout(values)
+    for i in range(values.shape[2]):
+        others = np.flatnonzero(needs[i])
+        if not len(others):
+            continue
+        ranks_i = _joint_ranks(_select(layout, [i]), valid[:, :, others])
+        ranks_j = _joint_ranks(_select(layout, others), valid[:, :, [i]])
+        n = (valid[:, :, [i]] & valid[:, :, others]).sum(axis=1)
+        centre = (n + 1) / 2.0
+        dev_i = np.nan_to_num(ranks_i - centre[:, None, :])
+        dev_j = np.nan_to_num(ranks_j - centre[:, None, :])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pair = (dev_i * dev_j).sum(axis=1) / np.sqrt((dev_i ** 2).sum(axis=1) * (dev_j ** 2).sum(axis=1))
+        pair = np.where(n >= 2, np.clip(pair, -1.0, 1.0), np.nan)
+        corr[:, i, others] = pair
+        corr[:, others, i] = pair
+    return corr
+
+
+def pairwise_correlations(panel, method='pearson'):
+    # panel is (year, country, indicator); each pair uses only countries observed for both
+    values = np.asarray(panel, dtype=np.float64)
+    if method == 'pearson':
+        corr, n = _pearson_from_masked(values)
+        return corr, n.astype(np.int64)
+    if method != 'spearman':
+        raise ValueError(f"Unsupported correlation method: {method}")
+
+    from scipy import stats
+
+    # Ranks over each indicator's own observations are exact for pairs whose joint mask loses no country;
+    # the remaining pairs are re-ranked on their joint mask
+    valid = ~np.isnan(values)
+    corr, n = _pearson_from_masked(stats.rankdata(values, axis=1, nan_policy='omit'))
+    observed = valid.sum(axis=1)
+    exact = (n == observed[:, :, None]) & (n == observed[:, None, :])
+    needs = np.triu(~exact.all(axis=0), k=1)
+    if needs.any():
+        corr = _rerank_pairs(values, valid, corr, needs)
+    return corr, n.astype(np.int64)
+
+
+def correlation_pvalues(corr, n):
+    # Two-sided t test of each coefficient; scipy.special is far lighter to import than scipy.stats
+    from scipy.special import stdtr
+
+    corr, n = np.asarray(corr, dtype=np.float64), np.asarray(n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dof = n - 2
+        t_stat = corr * np.sqrt(dof / (1 - corr ** 2))
+        p_values = 2 * stdtr(dof, -np.abs(t_stat))
+    p_values = np.where(n > 2, p_values, np.nan)
+    if p_values.ndim >= 2:
+        # An indicator against itself is not a test; leave the diagonal blank
+        diagonal = np.arange(p_values.shape[-1])
+        p_values[..., diagonal, diagonal] = np.nan
+    return p_values
+
+
+class CorrelationResult:
+    def __init__(self, years, indicators, corr, n_obs, method):
+        self.years = years
+        self.indicators = list(indicators)
+        self.corr = corr
+        self.n_obs = n_obs
+        self.method = method
+        self._positions = {int(year): i for i, year in enumerate(years)}
+        # p-values are only needed for the year on screen, so each year's slice is computed on first request
+        self._p_values = {}
+
+    def subset(self, indicators):
+        if list(indicators) == self.indicators:
+            return self
+        idx = np.array([self.indicators.index(indicator) for indicator in indicators], dtype=np.intp)
+        grid = np.ix_(np.arange(len(self.years)), idx, idx)
+        return CorrelationResult(self.years, indicators, self.corr[grid], self.n_obs[grid], self.method)
+
+    def _frame(self, array, year):
+        pos = self._positions.get(int(year))
+        if pos is None:
+            values = np.full((len(self.indicators), len(self.indicators)), np.nan)
+        else:
+            values = array[pos]
+        return pd.DataFrame(values, index=self.indicators, columns=self.indicators)
+
+    def matrix(self, year):
+        return self._frame(self.corr, year)
+
+    def counts(self, year):
+        return self._frame(self.n_obs, year)
+
+    def pvalues(self, year):
+        pos = self._positions.get(int(year))
+        if pos is not None and pos not in self._p_values:
+            self._p_values[pos] = correlation_pvalues(self.corr[pos], self.n_obs[pos])
+        values = self._p_values.get(pos, np.full((len(self.indicators), len(self.indicators)), np.nan))
+        return pd.DataFrame(values, index=self.indicators, columns=self.indicators)
+
+    def pair(self, year, x, y):
+        pos = self._positions.get(int(year))
+        if pos is None:
+            return np.nan, 0, np.nan
+        i, j = self.indicators.index(x), self.indicators.index(y)
+        p_value = correlation_pvalues(self.corr[pos, i, j], self.n_obs[pos, i, j]) if i != j else np.nan
+        return self.corr[pos, i, j], int(self.n_obs[pos, i, j]), float(p_value)
+
+
+class CorrelationEngine:
+    def __init__(self, maxsize=32):
+        self.results = LRUCache(maxsize, name='correlations')
+
+    def compute(self, data, indicators, method='pearson'):
+        version = data_version(data)
+        key = (version, tuple(indicators), method)
+        result = self.results.get(key)
+        if result is None:
+            # Any cached superset for the same data and method answers the query by slicing
+            for (cached_version, cached_indicators, cached_method), cached in self.results.items():
+                if cached_version == version and cached_method == method and set(indicators) <= set(cached_indicators):
+                    return cached.subset(indicators)
+            _, years, panel = to_panel(data, indicators)
+            corr, n_obs = pairwise_correlations(np.swapaxes(panel, 0, 1), method)
+            result = self.results.put(key, CorrelationResult(years, indicators, corr, n_obs, method))
+        return result
+
+    def carry_over(self, old_data, new_data, changes):
+        # Years with no changed cell in a result's indicators keep their matrices; only the rest are recomputed
+        old_version, new_version = data_version(old_data), data_version(new_data)
+        for (version, indicators, method), result in self.results.items():
+            if version != old_version:
+                continue
+            touched = set(changes.loc[changes['indicator'].isin(indicators), 'date'].astype(int))
+            _, years, panel = to_panel(new_data, indicators)
+            old_positions = [result._positions.get(int(year)) for year in years]
+            stale = np.array([pos is None or int(year) in touched for year, pos in zip(years, old_positions)], dtype=bool)
+            corr = np.empty((len(years), len(indicators), len(indicators)))
+            n_obs = np.empty(corr.shape, dtype=np.int64)
+            kept = np.array([pos for pos, is_stale in zip(old_positions, stale) if not is_stale], dtype=np.intp)
+            corr[~stale], n_obs[~stale] = result.corr[kept], result.n_obs[kept]
+            if stale.any():
+                corr[stale], n_obs[stale] = pairwise_correlations(np.swapaxes(panel[:, stale, :], 0, 1), method)
+            self.results.put((new_version, indicators, method), CorrelationResult(years, indicators, corr, n_obs, method))
+
+
+default_correlation_engine = CorrelationEngine()
@@ -0,0 +1,123 @@
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+from instrumentation import metrics
+
+
+class IndicatorCache:
+    def __init__(self, cache_dir, ttl=24 * 3600, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(indicator_code, start_year, end_year):
+        return f"{indicator_code}:{start_year}-{end_year}"
+
+    def _file_name(self, key):
+        return key.replace(':', '__').replace('.', '_') + '.parquet'
+
+    def _atomic_write_bytes(self, path, payload):
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(payload)
+        os.replace(tmp_path, path)
+
+    def _meta_path(self, file_name):
+        return self.cache_dir / (file_name[:-len('.parquet')] + '.meta.json')
+
+    def _read_meta(self, path):
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def entries(self):
+        # One metadata file per entry: replicas sharing the directory never rewrite each other's records
+        entries = {}
+        for path in self.cache_dir.glob('*.meta.json'):
+            entry = self._read_meta(path)
+            if entry is not None:
+                entries[entry['key']] = entry
+        return entries
+
+    def _last_access(self, entry):
+        # Hits bump the data file's atime instead of rewriting any metadata
+        try:
+            return (self.cache_dir / entry['file']).stat().st_atime
+        except OSError:
+            return 0.0
+
+    def is_fresh(self, entry, now=None):
+        now = time.time() if now is None else now
+        if self.ttl is not None and now - entry['created'] > self.ttl:
+            return False
+        return (self.cache_dir / entry['file']).exists()
+
+    def get(self, key):
+        file_name = self._file_name(key)
+        entry = self._read_meta(self._meta_path(file_name))
+        if entry is None or not self.is_fresh(entry):
+            metrics.increment('cache_misses', cache='indicators')
+            return None
+        path = self.cache_dir / file_name
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path, (time.time(), path.stat().st_mtime))
+        except (OSError, ValueError):
+            # Evicted by another replica between the metadata read and the data read
+            metrics.increment('cache_misses', cache='indicators')
+            return None
+        metrics.increment('cache_hits', cache='indicators')
+        return df
+
+    def put(self, key, df):
+        file_name = self._file_name(key)
+        tmp_path = self.cache_dir / f".{file_name}.{uuid.uuid4().hex}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.cache_dir / file_name)
+
+        # The metadata file is written last, so an entry is only visible once its data is complete
+        entry = {
+            'key': key,
+            'file': file_name,
+            'created': time.time(),
+            'bytes': (self.cache_dir / file_name).stat().st_size,
+            'rows': len(df)
+        }
+        self._atomic_write_bytes(self._meta_path(file_name), json.dumps(entry, sort_keys=True).encode())
+        self._evict(keep=key)
+
+    def _remove(self, entry):
+        self._meta_path(entry['file']).unlink(missing_ok=True)
+        (self.cache_dir / entry['file']).unlink(missing_ok=True)
+
+    def invalidate(self, keys=None):
+        entries = self.entries()
+        keys = list(entries) if keys is None else keys
+        for key in keys:
+            if key in entries:
+                self._remove(entries[key])
+
+    def _evict(self, keep=None):
+        entries = self.entries()
+        now = time.time()
+        for key in [k for k, entry in entries.items() if k != keep and not self.is_fresh(entry, now)]:
+            self._remove(entries.pop(key))
+
+        if self.max_bytes is None:
+            return
+        total = sum(entry['bytes'] for entry in entries.values())
+        for key in sorted(entries, key=lambda k: self._last_access(entries[k])):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry = entries.pop(key)
+            total -= entry['bytes']
+            self._remove(entry)
@@ -1,12 +1,29 @@
+import os
 import pandas as pd
 import numpy as np
-import requests
-from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
+from data_cache import IndicatorCache
+from instrumentation import instrument_class
+from data_store import KEY_COLUMNS, DataStore, to_frame
+from shared_store import load_shared_store, shared_generation
+from outliers import detect_anomalies
+from wdi_bulk import ANOMALIES_FILE, ingest_wdi_bulk, read_wdi_parquet
 
+@instrument_class('loader')
 class DataLoader:
-    def __init__(self):
-        self.world_bank_base_url = "https://api.worldbank.org/v2/country/all/indicator"
+    def __init__(self, base_url="https://api.worldbank.org/v2", max_workers=8, timeout=30, retries=3, backoff=0.5,
+                 cache_dir=None, cache_ttl=24 * 3600, cache_max_bytes=512 * 1024 * 1024, wdi_dir=None):
+        self.world_bank_base_url = f"{base_url.rstrip('/')}/country/all/indicator"
+        self.cache = IndicatorCache(cache_dir, cache_ttl, cache_max_bytes) if cache_dir else None
+        self.wdi_dir = wdi_dir
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._session = None
+        # Cells flagged by the screen that runs on every load and ingestion
+        self.anomalies = None
         self.indicators = {
             'GDP per capita (PPP)': 'NY.GDP.PCAP.PP.CD',
             'Gini index': 'SI.POV.GINI',
@@ -19,22 +36,153 @@ class DataLoader:
             'Infant mortality rate': 'SP.DYN.IMRT.IN',
             'Health spending per capita': 'SH.XPD.CHEX.PC.CD'
         }
+        self.domains = {
+            'economic': ['gdp_per_capita', 'gini_index', 'poverty_rate'],
+            'education': ['literacy_rate', 'education_spending'],
+            'health': ['life_expectancy', 'infant_mortality', 'health_spending']
+        }
+        # Column names used by Analytics/Visualizations for each World Bank code
+        self.indicator_columns = {
+            'NY.GDP.PCAP.PP.CD': 'gdp_per_capita',
+            'SI.POV.GINI': 'gini_index',
+            'SI.POV.DDAY': 'poverty_rate',
+            'SE.ADT.LITR.ZS': 'literacy_rate',
+            'SE.PRM.ENRR': 'primary_enrollment',
+            'SE.SEC.ENRR': 'secondary_enrollment',
+            'SE.XPD.TOTL.GD.ZS': 'education_spending',
+            'SP.DYN.LE00.IN': 'life_expectancy',
+            'SP.DYN.IMRT.IN': 'infant_mortality',
+            'SH.XPD.CHEX.PC.CD': 'health_spending'
+        }
+    
+    @property
+    def session(self):
+        if self._session is None:
+            # requests is only needed for live World Bank fetches, so keep it off the startup path
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            retry = Retry(
+                total=self.retries,
+                backoff_factor=self.backoff,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(['GET'])
+            )
+            adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers, max_retries=retry)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+    
+    def _fetch_page(self, indicator_code, start_year, end_year, page, per_page):
+        url = f"{self.world_bank_base_url}/{indicator_code}"
+        params = {
+            'format': 'json',
+            'date': f"{start_year}:{end_year}",
+            'per_page': per_page,
+            'page': page
+        }
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        payload = response.json()
+        # The API reports errors as a single-element list with a "message" entry
+        if not isinstance(payload, list) or len(payload) < 2:
+            message = payload[0].get('message') if isinstance(payload, list) and payload and isinstance(payload[0], dict) else payload
+            raise ValueError(f"Unexpected World Bank response for {indicator_code}: {message}")
+        return payload[0], payload[1] or []
+    
+    def _records_to_frame(self, indicator_code, records):
+        if not records:
+            return pd.DataFrame(columns=['country', 'countryiso3code', 'date', 'indicator', 'value'])
+        df = pd.DataFrame.from_records(records, columns=['country', 'countryiso3code', 'date', 'value'])
+        df['country'] = df['country'].map(lambda c: c.get('value') if isinstance(c, dict) else c)
+        df['date'] = pd.to_numeric(df['date'], errors='coerce')
+        df['value'] = pd.to_numeric(df['value'], errors='coerce')
+        df['indicator'] = indicator_code
+        return df[['country', 'countryiso3code', 'date', 'indicator', 'value']]
+    
+    def fetch_world_bank_data(self, indicator_code, start_year=1980, end_year=2022, per_page=10000):
+        meta, records = self._fetch_page(indicator_code, start_year, end_year, 1, per_page)
+        pages = int(meta.get('pages', 1) or 1)
+        for page in range(2, pages + 1):
+            records.extend(self._fetch_page(indicator_code, start_year, end_year, page, per_page)[1])
+        df = self._records_to_frame(indicator_code, records)
+        return df[['country', 'countryiso3code', 'value', 'date']]
+    
+    def fetch_all_indicators(self, indicator_codes=None, start_year=1980, end_year=2022, per_page=1000):
+        if indicator_codes is None:
+            indicator_codes = list(self.indicators.values())
+        
+        if self.cache is None:
+            return self._fetch_indicators(indicator_codes, start_year, end_year, per_page)
+        
+        # Serve fresh entries from disk and only hit the network for stale or missing indicators
+        keys = {code: self.cache.make_key(code, start_year, end_year) for code in indicator_codes}
+        cached = {}
+        for code, key in keys.items():
+            df = self.cache.get(key)
+            if df is not None:
+                cached[code] = df
+        stale_codes = [code for code in indicator_codes if code not in cached]
+        if stale_codes:
+            fetched = self._fetch_indicators(stale_codes, start_year, end_year, per_page)
+            fetched = {code: df for code, df in fetched.groupby('indicator', sort=False)}
+            for code in stale_codes:
+                # Indicators with no rows are cached too, so they are not fetched again on every call
+                df = fetched.get(code, self._records_to_frame(code, []))
+                self.cache.put(keys[code], df)
+                cached[code] = df
+        
+        frames = [cached[code] for code in indicator_codes if len(cached[code])]
+        if not frames:
+            return self._records_to_frame(None, [])
+        return pd.concat(frames, ignore_index=True)
     
-    def fetch_world_bank_data(self, indicator_code, start_year=1980, end_year=2022):
-        url = f"{self.world_bank_base_url}/{indicator_code}?format=json&date={start_year}:{end_year}&per_page=1000"
-        try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                data = response.json()
-                if len(data) > 1 and data[1]:
-                    df = pd.DataFrame(data[1])
-                    df = df[['country', 'countryiso3code', 'value', 'date']]
-                    df['date'] = pd.to_numeric(df['date'])
-                    df['value'] = pd.to_numeric(df['value'], errors='coerce')
-                    return df
-        except:
-            pass
-        return pd.DataFrame()
+    def invalidate_cache(self, indicator_codes=None, start_year=1980, end_year=2022):
+        if self.cache is None:
+            return
+        if indicator_codes is None:
+            self.cache.invalidate()
+        else:
+            self.cache.invalidate([self.cache.make_key(code, start_year, end_year) for code in indicator_codes])
+    
+    def _fetch_indicators(self, indicator_codes, start_year, end_year, per_page):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # First pages reveal the page count, remaining pages are fanned out in one batch
+            first_pages = {
+                code: executor.submit(self._fetch_page, code, start_year, end_year, 1, per_page)
+                for code in indicator_codes
+            }
+            records = {}
+            rest = []
+            for code, future in first_pages.items():
+                meta, rows = future.result()
+                records[code] = [rows]
+                pages = int(meta.get('pages', 1) or 1)
+                for page in range(2, pages + 1):
+                    rest.append((code, page, executor.submit(self._fetch_page, code, start_year, end_year, page, per_page)))
+            for code, page, future in sorted(rest, key=lambda item: (item[0], item[1])):
+                records[code].append(future.result()[1])
+        
+        frames = [
+            self._records_to_frame(code, [row for rows in records[code] for row in rows])
+            for code in indicator_codes
+        ]
+        return pd.concat(frames, ignore_index=True)
+    
+    def pivot_indicators(self, long_data):
+        wide = (
+            long_data.groupby(['country', 'countryiso3code', 'date', 'indicator'], sort=True)['value']
+            .first()
+            .unstack('indicator')
+            .reset_index()
+        )
+        wide.columns.name = None
+        codes = [code for code in long_data['indicator'].unique() if code in wide.columns]
+        wide = wide[['country', 'countryiso3code', 'date'] + codes]
+        return wide.rename(columns=self.indicator_columns)
     
     def create_sample_data(self):
         countries = ['USA', 'China', 'India', 'Germany', 'Japan', 'Brazil', 'UK', 'France', 'Italy', 'Canada']
@@ -63,18 +211,82 @@ class DataLoader:
         
         return pd.DataFrame(data)
     
-    def load_data(self):
+    def load_world_bank_data(self, start_year=1980, end_year=2022):
+        return self.pivot_indicators(self.fetch_all_indicators(start_year=start_year, end_year=end_year))
+    
+    def ingest_wdi_bulk(self, path, output_dir=None, chunksize=50000):
+        output_dir = ingest_wdi_bulk(path, output_dir or self.wdi_dir, self.indicator_columns, chunksize)
+        data = read_wdi_parquet(output_dir)
+        if not data.empty:
+            # Flagged cells are kept in the data and written next to the partitions for review
+            self.anomalies = self.screen_anomalies(DataStore(data))
+            self.anomalies.to_parquet(output_dir / ANOMALIES_FILE, index=False)
+        return output_dir
+    
+    def load_wdi_data(self, start_year=1980, end_year=2022):
+        return read_wdi_parquet(self.wdi_dir, start_year, end_year)
+    
+    def load_data(self, source='sample'):
         st.info("Loading global inequality data...")
         
-        sample_data = self.create_sample_data()
+        if source == 'world_bank':
+            sample_data = self.load_world_bank_data()
+        elif source == 'wdi':
+            sample_data = self.load_wdi_data()
+        else:
+            sample_data = self.create_sample_data()
         
-        economic_data = sample_data[['country', 'countryiso3code', 'date', 'gdp_per_capita', 'gini_index', 'poverty_rate']].copy()
-        education_data = sample_data[['country', 'countryiso3code', 'date', 'literacy_rate', 'education_spending']].copy()
-        health_data = sample_data[['country', 'countryiso3code', 'date', 'life_expectancy', 'infant_mortality', 'health_spending']].copy()
+        # One compact, (year, country)-sorted store; domains are column views over it
+        store = DataStore(sample_data, self.domains)
+        # Screen on ingestion: suspicious cells stay in the data but are listed in self.anomalies
+        self.anomalies = self.screen_anomalies(store)
+        return store
+    
+    def load_shared_data(self, shared_path, source='sample', generation=None):
+        # One process materialises the store into memory-mapped files; the rest attach read-only
+        return load_shared_store(shared_path, lambda: self.load_data(source), source, generation)
+    
+    def screen_anomalies(self, data, indicators=None, **kwargs):
+        # Flags suspicious cells (robust level outliers, implausible jumps) in freshly loaded data
+        if indicators is None:
+            indicators = data.indicators if isinstance(data, DataStore) else [
+                col for col in data.columns if col not in KEY_COLUMNS
+            ]
+        return detect_anomalies(data, indicators, **kwargs)
+    
+    def diff_snapshots(self, old_data, new_data, rtol=1e-6):
+        # Long (indicator, country, date) cells of both snapshots, outer-aligned and compared NaN-aware
+        def cells(data):
+            frame = to_frame(data)
+            indicators = [col for col in frame.columns if col not in KEY_COLUMNS]
+            long = frame.astype({'country': str}).melt(
+                id_vars=['country', 'date'], value_vars=indicators, var_name='indicator', value_name='value'
+            )
+            long['date'] = long['date'].astype(int)
+            return long.set_index(['indicator', 'country', 'date'])['value'].astype(np.float64)
         
-        return {
-            'economic': economic_data,
-            'education': education_data,
-            'health': health_data,
-            'combined': sample_data
-        } 
\ No newline at end of file
+        old_values, new_values = cells(old_data).align(cells(new_data), join='outer')
+        same = np.isclose(old_values.to_numpy(), new_values.to_numpy(), rtol=rtol, equal_nan=True)
+        changes = pd.DataFrame({'old_value': old_values[~same], 'new_value': new_values[~same]})
+        return changes.reset_index().sort_values(['indicator', 'date', 'country'], ignore_index=True)
+    
+    def save_snapshot(self, data, path):
+        to_frame(data).to_parquet(path, index=False)
+    
+    def load_snapshot(self, path):
+        return DataStore(pd.read_parquet(path), self.domains)
+    
+    def refresh(self, snapshot_path, source='world_bank', shared_path=None):
+        # Pull new data, diff it against the stored snapshot and replace the snapshot
+        new_store = self.load_data(source)
+        if os.path.exists(snapshot_path):
+            changes = self.diff_snapshots(self.load_snapshot(snapshot_path), new_store)
+        else:
+            changes = self.diff_snapshots(new_store.frame.iloc[0:0], new_store)
+        self.save_snapshot(new_store, snapshot_path)
+        if shared_path is not None:
+            # A new generation makes every attached process pick up the refreshed data on its next load
+            generation = shared_generation(shared_path) + 1 if len(changes) else None
+            built = new_store
+            new_store = load_shared_store(shared_path, lambda: built, source, generation)
+        return new_store, changes
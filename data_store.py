@@ -0,0 +1,222 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation import metrics
+
+KEY_COLUMNS = ['country', 'countryiso3code', 'date']
+
+
+class DataStore:
+    def __init__(self, data, domains=None):
+        self.indicators = [col for col in data.columns if col not in KEY_COLUMNS]
+        self.domains = dict(domains or {})
+
+        country = pd.Categorical(data['country'])
+        iso_codes = pd.Categorical(data['countryiso3code'])
+        dates = data['date'].to_numpy().astype('int16')
+        order = np.lexsort((country.codes, dates))
+
+        # All indicators share one contiguous float32 block; domain views select from it
+        numeric = data[self.indicators]
+        if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in numeric.dtypes):
+            numeric = numeric.apply(pd.to_numeric, errors='coerce')
+        values = np.ascontiguousarray(numeric.to_numpy(dtype=np.float32, na_value=np.nan)[order])
+        self._build(values, dates[order], country[order], iso_codes[order])
+
+    @classmethod
+    def from_arrays(cls, values, dates, country, iso_codes, indicators, domains=None, version=None, panel=None):
+        # Arrays must already be sorted by (year, country); they are used as-is, e.g. memory-mapped
+        store = cls.__new__(cls)
+        store.indicators = list(indicators)
+        store.domains = dict(domains or {})
+        store._build(values, dates, country, iso_codes)
+        store._version = version
+        store._panel = panel
+        return store
+
+    def _build(self, values, dates, country, iso_codes):
+        self.values = values
+        frame = pd.DataFrame(values, columns=self.indicators, copy=False)
+        frame.insert(0, 'date', dates)
+        frame.insert(0, 'countryiso3code', iso_codes)
+        frame.insert(0, 'country', country)
+        self.frame = frame
+
+        # Rows are contiguous per year, so a year lookup is a slice of the frame
+        dates = frame['date'].to_numpy()
+        self.years = np.unique(dates)
+        starts = np.searchsorted(dates, self.years, side='left')
+        stops = np.searchsorted(dates, self.years, side='right')
+        self._year_slices = {int(year): (start, stop) for year, start, stop in zip(self.years, starts, stops)}
+
+        # Rows per country are strided across years; keep their positions in year order
+        codes = frame['country'].cat.codes.to_numpy()
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(frame['country'].cat.categories) + 1))
+        self._country_rows = {
+            name: order[bounds[i]:bounds[i + 1]]
+            for i, name in enumerate(frame['country'].cat.categories)
+        }
+        self._positions = {name: i for i, name in enumerate(self.indicators)}
+        self._panel = None
+        self._layout = None
+        self._version = None
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __getitem__(self, name):
+        return self.domain(name)
+
+    def domain(self, name):
+        if name == 'combined':
+            return self.frame
+        columns = [col for col in self.domains[name] if col in self.frame.columns]
+        return self.frame[KEY_COLUMNS + columns]
+
+    @property
+    def version(self):
+        if self._version is None:
+            self._version = frame_version(self.frame)
+        return self._version
+
+    @property
+    def country_names(self):
+        return [name for name, rows in self._country_rows.items() if len(rows)]
+
+    def year(self, year):
+        start, stop = self._year_slices.get(int(year), (0, 0))
+        return self.frame.iloc[start:stop]
+
+    def years_between(self, start_year, end_year):
+        dates = self.frame['date'].to_numpy()
+        start = np.searchsorted(dates, start_year, side='left')
+        stop = np.searchsorted(dates, end_year, side='right')
+        return self.frame.iloc[start:stop]
+
+    def country(self, country, start_year=None, end_year=None):
+        rows = self._country_rows.get(country, np.empty(0, dtype=np.intp))
+        if start_year is not None or end_year is not None:
+            dates = self.frame['date'].to_numpy()[rows]
+            lo = np.searchsorted(dates, start_year, side='left') if start_year is not None else 0
+            hi = np.searchsorted(dates, end_year, side='right') if end_year is not None else len(rows)
+            rows = rows[lo:hi]
+        return self.frame.take(rows)
+
+    def _grid(self):
+        # Country code and year position of every row, and whether the rows fill the whole (year x country) grid
+        if self._layout is None:
+            codes = self.frame['country'].cat.codes.to_numpy()
+            n_countries = len(self.frame['country'].cat.categories)
+            complete = len(codes) == len(self.years) * n_countries and np.array_equal(
+                codes, np.tile(np.arange(n_countries, dtype=codes.dtype), len(self.years)))
+            self._layout = (codes, np.searchsorted(self.years, self.frame['date'].to_numpy()), complete)
+        return self._layout
+
+    @property
+    def complete_grid(self):
+        return self._grid()[2]
+
+    def _dense(self, columns):
+        codes, year_pos, _ = self._grid()
+        values = self.values[:, columns]
+        panel = np.full((len(self.frame['country'].cat.categories), len(self.years), values.shape[1]), np.nan,
+                        dtype=np.float32)
+        panel[codes, year_pos, :] = values
+        return panel
+
+    @property
+    def panel(self):
+        # (country x year x indicator) float32 over every indicator, NaN for missing cells
+        if self._panel is not None:
+            return self._panel
+        if not self.complete_grid:
+            return self._dense(slice(None))
+        # Rows are sorted by (year, country), so a complete grid is the values block itself, reshaped: no copy
+        panel = self.values.reshape(len(self.years), -1, len(self.indicators)).transpose(1, 0, 2)
+        if panel.flags.writeable:
+            # Shared by every caller, so writes through a returned view must fail loudly
+            panel = panel.view()
+            panel.flags.writeable = False
+        self._panel = panel
+        return panel
+
+    def to_panel(self, indicators):
+        # Contiguous indicator runs are views of the panel; other selections copy only their columns
+        idx = [self._positions[col] for col in indicators]
+        columns = slice(idx[0], idx[0] + len(idx)) if idx and idx == list(range(idx[0], idx[0] + len(idx))) else idx
+        if self._panel is None and not self.complete_grid:
+            # Gaps in the grid: scatter only the requested columns instead of densifying every indicator
+            panel = self._dense(columns)
+        else:
+            panel = self.panel[:, :, columns]
+        return list(self.frame['country'].cat.categories), self.years, panel
+
+    def countries(self, countries, start_year=None, end_year=None):
+        rows = [self._country_rows.get(country, np.empty(0, dtype=np.intp)) for country in countries]
+        rows = np.sort(np.concatenate(rows)) if rows else np.empty(0, dtype=np.intp)
+        if start_year is not None or end_year is not None:
+            dates = self.frame['date'].to_numpy()[rows]
+            keep = np.ones(len(rows), dtype=bool)
+            if start_year is not None:
+                keep &= dates >= start_year
+            if end_year is not None:
+                keep &= dates <= end_year
+            rows = rows[keep]
+        return self.frame.take(rows)
+
+
+def frame_version(frame):
+    hashed = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    columns = pd.util.hash_pandas_object(pd.Index(frame.columns.astype(str)), index=False).to_numpy()
+    return f"{len(frame)}-{int(hashed.sum()):016x}-{int(columns.sum()):016x}"
+
+
+def data_version(data):
+    return data.version if isinstance(data, DataStore) else frame_version(data)
+
+
+def to_frame(data):
+    return data.frame if isinstance(data, DataStore) else data
+
+
+def to_panel(data, indicators):
+    store = data if isinstance(data, DataStore) else DataStore(data[KEY_COLUMNS + list(indicators)])
+    return store.to_panel(indicators)
+
+
+def _scanned(result, rows, path):
+    # Index lookups only touch the rows they return; mask fallbacks scan the whole frame
+    metrics.increment('rows_scanned', rows, path=path)
+    return result
+
+
+def select_year(data, year):
+    if isinstance(data, DataStore):
+        result = data.year(year)
+        return _scanned(result, len(result), 'index')
+    return _scanned(data[data['date'] == year], len(data), 'scan')
+
+
+def select_country(data, country, start_year=None, end_year=None):
+    if isinstance(data, DataStore):
+        result = data.country(country, start_year, end_year)
+        return _scanned(result, len(result), 'index')
+    mask = data['country'] == country
+    if start_year is not None:
+        mask &= data['date'] >= start_year
+    if end_year is not None:
+        mask &= data['date'] <= end_year
+    return _scanned(data[mask], len(data), 'scan')
+
+
+def select_countries(data, countries, start_year=None, end_year=None):
+    if isinstance(data, DataStore):
+        result = data.countries(countries, start_year, end_year)
+        return _scanned(result, len(result), 'index')
+    mask = data['country'].isin(countries)
+    if start_year is not None:
+        mask &= data['date'] >= start_year
+    if end_year is not None:
+        mask &= data['date'] <= end_year
+    return _scanned(data[mask], len(data), 'scan')
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: indices of the points that best keep the line's shape
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_start, next_stop = stop, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def minmax_decimate(y, n_buckets):
+    # Keep the min and max of each bucket so spikes survive decimation
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    filled = np.where(np.isnan(y), np.nanmean(y) if (~np.isnan(y)).any() else 0.0, y)
+    keep = []
+    for start, stop in zip(edges[:-1], edges[1:]):
+        bucket = filled[start:stop]
+        keep.extend((start + int(np.argmin(bucket)), start + int(np.argmax(bucket))))
+    return np.unique(keep)
+
+
+def downsample_series(data, x_col, y_col, group_col, max_points, method='lttb'):
+    frames = []
+    for _, series in data.sort_values(x_col).groupby(group_col, observed=True, sort=False):
+        series = series.dropna(subset=[y_col])
+        if len(series) > max_points:
+            if method == 'minmax':
+                keep = minmax_decimate(series[y_col].to_numpy(), max(max_points // 2, 1))
+            else:
+                keep = lttb(series[x_col].to_numpy(), series[y_col].to_numpy(), max_points)
+            series = series.iloc[keep]
+        frames.append(series)
+    return pd.concat(frames) if frames else data.iloc[0:0]
+
+
+def percentile_bands(data, value_col, x_col='date', percentiles=(10, 50, 90)):
+    grouped = data.groupby(x_col, observed=True)[value_col]
+    bands = grouped.quantile([p / 100 for p in percentiles]).unstack()
+    bands.columns = [f"p{p}" for p in percentiles]
+    return bands.reset_index()
+
+
+def grid_thin(x, y, max_points):
+    # Keep at most one point per cell of a sqrt(max_points) x sqrt(max_points) grid
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(x) & ~np.isnan(y))
+    if len(valid) <= max_points:
+        return valid
+    side = max(int(np.sqrt(max_points)), 1)
+    xv, yv = x[valid], y[valid]
+    span_x = np.ptp(xv) or 1.0
+    span_y = np.ptp(yv) or 1.0
+    cell_x = np.minimum(((xv - xv.min()) / span_x * side).astype(int), side - 1)
+    cell_y = np.minimum(((yv - yv.min()) / span_y * side).astype(int), side - 1)
+    _, first = np.unique(cell_x * side + cell_y, return_index=True)
+    return valid[np.sort(first)]
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+
+def _clean(values, weights=None):
+    values = np.asarray(values, dtype=np.float64)
+    if weights is None:
+        return values[~np.isnan(values)], None
+    weights = np.asarray(weights, dtype=np.float64)
+    keep = ~np.isnan(values) & ~np.isnan(weights) & (weights > 0)
+    return values[keep], weights[keep]
+
+
+def gini(values, weights=None, presorted=False):
+    values, weights = _clean(values, weights)
+    n = len(values)
+    if n == 0:
+        return np.nan
+
+    if not presorted:
+        order = np.argsort(values, kind='stable')
+        values = values[order]
+        weights = weights[order] if weights is not None else None
+
+    if weights is None:
+        cumsum = np.cumsum(values)
+        return (n + 1 - 2 * np.sum(cumsum) / cumsum[-1]) / n
+
+    # Trapezoid area under the weighted Lorenz curve
+    weighted = values * weights
+    cumsum = np.cumsum(weighted)
+    return 1 - np.sum(weights * (2 * cumsum - weighted)) / (weights.sum() * cumsum[-1])
+
+
+def gini_along_axis(array, axis=0):
+    # np.sort moves NaNs to the end, so only the first n positions along the axis count
+    array = np.moveaxis(np.asarray(array, dtype=np.float64), axis, 0)
+    sorted_array = np.sort(array, axis=0)
+    n = (~np.isnan(array)).sum(axis=0)
+    cumsum = np.cumsum(np.nan_to_num(sorted_array), axis=0)
+    positions = np.arange(array.shape[0]).reshape((-1,) + (1,) * (array.ndim - 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = (n + 1 - 2 * np.where(positions < n, cumsum, 0.0).sum(axis=0) / cumsum[-1]) / n
+    return np.where(n == 0, np.nan, result)
+
+
+def grouped_gini(data, value_col, by='date', weight_col=None):
+    columns = [by, value_col] + ([weight_col] if weight_col else [])
+    frame = data[columns].dropna()
+    if weight_col:
+        frame = frame[frame[weight_col] > 0]
+    if frame.empty:
+        return pd.Series(dtype=np.float64, name='gini')
+
+    groups, group_ids = np.unique(frame[by].to_numpy(), return_inverse=True)
+    values = frame[value_col].to_numpy(dtype=np.float64)
+    weights = frame[weight_col].to_numpy(dtype=np.float64) if weight_col else np.ones(len(values))
+
+    # One lexsort orders every group by value; segment sums replace per-group sorts
+    order = np.lexsort((values, group_ids))
+    group_ids, values, weights = group_ids[order], values[order], weights[order]
+    starts = np.flatnonzero(np.r_[True, group_ids[1:] != group_ids[:-1]])
+
+    weighted = values * weights
+    cumsum = np.cumsum(weighted)
+    offsets = np.r_[0.0, cumsum[starts[1:] - 1]]
+    group_cumsum = cumsum - np.repeat(offsets, np.diff(np.r_[starts, len(values)]))
+
+    totals = np.add.reduceat(weighted, starts)
+    total_weights = np.add.reduceat(weights, starts)
+    areas = np.add.reduceat(weights * (2 * group_cumsum - weighted), starts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = 1 - areas / (total_weights * totals)
+    return pd.Series(result, index=pd.Index(groups, name=by), name='gini')
+
+
+class IncrementalGini:
+    def __init__(self, values):
+        values, _ = _clean(values)
+        self.sorted_values = np.sort(values)
+
+    def __len__(self):
+        return len(self.sorted_values)
+
+    def update(self, old_value, new_value):
+        # O(n) array shift instead of an O(n log n) re-sort when one value moves
+        if old_value is not None and not np.isnan(old_value):
+            pos = np.searchsorted(self.sorted_values, old_value)
+            if pos < len(self.sorted_values) and self.sorted_values[pos] == old_value:
+                self.sorted_values = np.delete(self.sorted_values, pos)
+        if new_value is not None and not np.isnan(new_value):
+            pos = np.searchsorted(self.sorted_values, new_value)
+            self.sorted_values = np.insert(self.sorted_values, pos, new_value)
+        return self.value
+
+    @property
+    def value(self):
+        return gini(self.sorted_values, presorted=True)
@@ -0,0 +1,146 @@
+import json
+import os
+import time
+from collections import defaultdict, deque
+from functools import wraps
+from threading import Lock
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_HELP = {
+    'rows_scanned': "Rows read from the data store, by access path",
+    'cache_hits': "Cache lookups served from memory or disk",
+    'cache_misses': "Cache lookups that had to recompute",
+    'figures_built': "Figures built, by figure method",
+    'figure_payload_bytes': "Serialized size of built figures",
+    'span_seconds': "Wall time of instrumented calls, by span"
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels) + '}'
+
+
+def _family_header(lines, family, name, kind):
+    help_text = METRIC_HELP.get(name, name).replace('\\', '\\\\').replace('\n', '\\n')
+    lines.append(f"# HELP {family} {help_text}")
+    lines.append(f"# TYPE {family} {kind}")
+
+
+class Instrumentation:
+    def __init__(self, enabled=False, max_events=1000):
+        self.enabled = enabled
+        self._lock = Lock()
+        self.counters = defaultdict(float)
+        self.durations = {}
+        self.events = deque(maxlen=max_events)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.durations.clear()
+            self.events.clear()
+
+    def increment(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[(name, _label_key(labels))] += value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.durations.get(key)
+            if histogram is None:
+                histogram = self.durations[key] = {'count': 0, 'sum': 0.0, 'buckets': [0] * len(DURATION_BUCKETS)}
+            histogram['count'] += 1
+            histogram['sum'] += seconds
+            # Buckets are cumulative, as Prometheus expects
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    histogram['buckets'][i] += 1
+            self.events.append({'ts': time.time(), 'metric': name, 'seconds': seconds, **labels})
+
+    def summary(self):
+        with self._lock:
+            rows = [
+                {'span': dict(labels).get('span', name), 'calls': h['count'], 'total_s': h['sum'],
+                 'mean_ms': 1000 * h['sum'] / h['count'] if h['count'] else 0.0}
+                for (name, labels), h in self.durations.items()
+            ]
+            counters = [
+                {'counter': name, **dict(labels), 'value': value}
+                for (name, labels), value in self.counters.items()
+            ]
+        return sorted(rows, key=lambda row: -row['total_s']), counters
+
+    def to_prometheus(self, prefix='inequality_dashboard'):
+        # Samples of one family are contiguous after sorting, so each header is written once
+        lines = []
+        with self._lock:
+            family = None
+            for (name, labels), value in sorted(self.counters.items()):
+                if family != f"{prefix}_{name}_total":
+                    family = f"{prefix}_{name}_total"
+                    _family_header(lines, family, name, 'counter')
+                lines.append(f"{family}{_format_labels(labels)} {value:g}")
+            for (name, labels), h in sorted(self.durations.items()):
+                if family != f"{prefix}_{name}":
+                    family = f"{prefix}_{name}"
+                    _family_header(lines, family, name, 'histogram')
+                for bound, count in zip(DURATION_BUCKETS, h['buckets']):
+                    lines.append(f"{prefix}_{name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+                lines.append(f"{prefix}_{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {h['count']}")
+                lines.append(f"{prefix}_{name}_sum{_format_labels(labels)} {h['sum']:.6f}")
+                lines.append(f"{prefix}_{name}_count{_format_labels(labels)} {h['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def to_json_lines(self):
+        with self._lock:
+            return ''.join(json.dumps(event, default=str) + '\n' for event in self.events)
+
+
+metrics = Instrumentation(enabled=os.environ.get('INEQUALITY_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes'))
+
+
+def timed(name):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # Disabled path is a single attribute check before the real call
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe('span_seconds', time.perf_counter() - start, span=name)
+        return wrapper
+    return decorator
+
+
+def instrument_class(prefix):
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if callable(value) and not attr.startswith('_') and not isinstance(value, (staticmethod, classmethod)):
+                setattr(cls, attr, timed(f"{prefix}.{attr}")(value))
+        return cls
+    return decorator
@@ -0,0 +1,165 @@
+from collections import OrderedDict
+from threading import RLock
+
+import numpy as np
+import pandas as pd
+
+from data_store import data_version, select_year, to_frame
+from instrumentation import metrics
+
+
+class LRUCache:
+    def __init__(self, maxsize=128, name='lru'):
+        self.maxsize = maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.increment('cache_hits', cache=self.name)
+                return self._entries[key]
+            self.misses += 1
+            metrics.increment('cache_misses', cache=self.name)
+            return default
+
+    def peek(self, key, default=None):
+        return self._entries.get(key, default)
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def items(self):
+        with self._lock:
+            return list(self._entries.items())
+
+
+class ModelCache:
+    def __init__(self, maxsize=64):
+        self.models = LRUCache(maxsize, name='models')
+
+    def _fit_data(self, data, indicators, year):
+        year_data = select_year(data, year).dropna(subset=list(indicators)).copy()
+        return year_data, year_data[list(indicators)].to_numpy(dtype=np.float64)
+
+    def fit_pca(self, data, indicators, year, n_components=2):
+        key = ('pca', tuple(indicators), int(year), n_components, data_version(data))
+        cached = self.models.get(key)
+        if cached is None:
+            # scikit-learn takes longer to import than the rest of the app; load it on first fit
+            from sklearn.decomposition import PCA
+            from sklearn.preprocessing import StandardScaler
+
+            year_data, values = self._fit_data(data, indicators, year)
+            scaler = StandardScaler()
+            pca = PCA(n_components=n_components)
+            result = pca.fit_transform(scaler.fit_transform(values))
+            cached = self.models.put(key, (year_data.index, scaler, pca, result))
+        index, scaler, pca, result = cached
+        return index, pca, result
+
+    def _fit_kmeans(self, data, indicators, year, n_clusters, init=None):
+        from sklearn.cluster import KMeans
+        from sklearn.preprocessing import StandardScaler
+
+        year_data, values = self._fit_data(data, indicators, year)
+        scaler = StandardScaler()
+        scaled = scaler.fit_transform(values)
+        # Warm starts take centroids in original units; KMeans keeps init order, so labels stay aligned with them
+        if init is not None:
+            kmeans = KMeans(n_clusters=n_clusters, init=scaler.transform(init), n_init=1, random_state=42)
+        else:
+            kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+        labels = kmeans.fit_predict(scaled)
+        return year_data.index, labels, scaler.inverse_transform(kmeans.cluster_centers_)
+
+    def fit_kmeans(self, data, indicators, year, n_clusters=3):
+        # Always a cold fit, so a key holds one clustering whatever else happens to be cached
+        key = ('kmeans', tuple(indicators), int(year), n_clusters, data_version(data))
+        cached = self.models.get(key)
+        if cached is None:
+            cached = self.models.put(key, self._fit_kmeans(data, indicators, year, n_clusters))
+        return cached
+
+    def _realign(self, index, old_data, new_data, year):
+        # Cached fits hold row labels of the old data; map them to the same countries' rows in the new data
+        countries = to_frame(old_data).loc[index, 'country'].astype(str).to_numpy()
+        new_year = select_year(new_data, year)
+        positions = pd.Index(new_year['country'].astype(str)).get_indexer(countries)
+        if (positions < 0).any():
+            return None
+        return new_year.index[positions]
+
+    def carry_over(self, old_data, new_data, changes):
+        # Fits whose year saw no change in any of their indicators stay valid for the new data version
+        old_version, new_version = data_version(old_data), data_version(new_data)
+        changed = set(zip(changes['indicator'], changes['date'].astype(int)))
+        for key, value in self.models.items():
+            kind, indicators, year, params, version = key
+            # A warm-started fit also depends on every earlier year of its chain
+            years = params[1][:params[1].index(year) + 1] if isinstance(params, tuple) else (year,)
+            if version != old_version or any((indicator, y) in changed for indicator in indicators for y in years):
+                continue
+            index = self._realign(value[0], old_data, new_data, year)
+            if index is not None:
+                self.models.put((kind, indicators, year, params, new_version), (index,) + tuple(value[1:]))
+
+    def fit_all_years(self, data, indicators, n_clusters=3, years=None):
+        from scipy.optimize import linear_sum_assignment
+
+        if years is None:
+            years = np.unique(to_frame(data)['date'])
+        # Each year warm-starts from the previous one in this fixed order; the chain is part of the key
+        chain = tuple(int(year) for year in years)
+        version = data_version(data)
+        frames = []
+        previous_centers = warm_start = None
+        for year in chain:
+            if select_year(data, year)[list(indicators)].dropna().shape[0] < n_clusters:
+                continue
+            key = ('kmeans', tuple(indicators), year, (n_clusters, chain), version)
+            cached = self.models.get(key)
+            if cached is None:
+                cached = self.models.put(key, self._fit_kmeans(data, indicators, year, n_clusters, warm_start))
+            index, labels, centers = cached
+            warm_start = centers
+
+            # Relabel so each cluster keeps the id of the nearest previous-year centroid
+            if previous_centers is not None:
+                scale = np.where(centers.std(axis=0) > 0, centers.std(axis=0), 1.0)
+                cost = (((previous_centers[:, None, :] - centers[None, :, :]) / scale) ** 2).sum(axis=2)
+                rows, cols = linear_sum_assignment(cost)
+                mapping = np.empty(n_clusters, dtype=int)
+                mapping[cols] = rows
+                labels = mapping[labels]
+                centers = centers[np.argsort(mapping)]
+            previous_centers = centers
+
+            year_data = select_year(data, year).loc[index, ['country', 'countryiso3code', 'date'] + list(indicators)]
+            frames.append(year_data.assign(cluster=labels))
+        if not frames:
+            return pd.DataFrame(columns=['country', 'countryiso3code', 'date'] + list(indicators) + ['cluster'])
+        return pd.concat(frames, ignore_index=True)
+
+
+default_model_cache = ModelCache()
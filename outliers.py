@@ -0,0 +1,83 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from data_store import to_panel
+
+MAD_SCALE = 1.4826
+
+
+def _nan_quiet(func, *args, **kwargs):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return func(*args, **kwargs)
+
+
+def robust_z_scores(panel, axis=0):
+    # Median/MAD z-scores; unlike mean/std they are not dragged around by the outliers themselves
+    median = _nan_quiet(np.nanmedian, panel, axis=axis, keepdims=True)
+    mad = _nan_quiet(np.nanmedian, np.abs(panel - median), axis=axis, keepdims=True) * MAD_SCALE
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(mad > 0, (panel - median) / mad, np.nan)
+
+
+def classic_z_scores(panel, axis=0):
+    mean = _nan_quiet(np.nanmean, panel, axis=axis, keepdims=True)
+    std = _nan_quiet(np.nanstd, panel, axis=axis, ddof=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(std > 0, (panel - mean) / std, np.nan)
+
+
+def jump_scores(panel):
+    # Robust z-score of each year-over-year change against that country's own history of changes
+    changes = np.full_like(panel, np.nan)
+    changes[:, 1:, :] = np.diff(panel, axis=1)
+    return robust_z_scores(changes, axis=1)
+
+
+def mahalanobis_scores(panel):
+    # Squared Mahalanobis distance of each country from its year's centroid over all indicators
+    n_countries, n_years, n_indicators = panel.shape
+    scores = np.full((n_countries, n_years), np.nan)
+    for year in range(n_years):
+        values = panel[:, year, :]
+        complete = ~np.isnan(values).any(axis=1)
+        if complete.sum() <= n_indicators:
+            continue
+        rows = values[complete].astype(np.float64)
+        centered = rows - rows.mean(axis=0)
+        precision = np.linalg.pinv(np.cov(centered, rowvar=False))
+        scores[complete, year] = np.einsum('ij,jk,ik->i', centered, precision, centered)
+    return scores
+
+
+def detect_anomalies(data, indicators, method='robust', threshold=3.5, jump_threshold=5.0,
+                     mahalanobis=False, alpha=0.001):
+    countries, years, panel = to_panel(data, indicators)
+    countries = np.asarray(countries, dtype=object)
+    indicators = np.asarray(list(indicators), dtype=object)
+    years = years.astype(int)
+
+    frames = []
+    level = robust_z_scores(panel) if method == 'robust' else classic_z_scores(panel)
+    for kind, scores, limit in (('level', level, threshold), ('jump', jump_scores(panel), jump_threshold)):
+        c, y, k = np.nonzero(np.abs(np.nan_to_num(scores)) > limit)
+        frames.append(pd.DataFrame({
+            'country': countries[c], 'date': years[y], 'indicator': indicators[k],
+            'kind': kind, 'value': panel[c, y, k], 'score': scores[c, y, k]
+        }))
+
+    if mahalanobis and len(indicators) > 1:
+        from scipy import stats
+
+        scores = mahalanobis_scores(panel)
+        c, y = np.nonzero(np.nan_to_num(scores) > stats.chi2.ppf(1 - alpha, len(indicators)))
+        frames.append(pd.DataFrame({
+            'country': countries[c], 'date': years[y], 'indicator': '*',
+            'kind': 'multivariate', 'value': np.nan, 'score': scores[c, y]
+        }))
+
+    anomalies = pd.concat(frames, ignore_index=True)
+    anomalies['kind'] = anomalies['kind'].astype('category')
+    return anomalies.sort_values(['date', 'indicator', 'country'], ignore_index=True)
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from threadpoolctl import threadpool_limits
+
+MANIFEST_FILE = 'manifest.json'
+DATA_DIR = '.data'
+CLUSTER_INDICATORS = ['gdp_per_capita', 'gini_index', 'life_expectancy']
+
+_worker = {}
+
+
+def build_jobs(indicators, years, cluster_indicators):
+    # Small, independent jobs balance well across the pool; each one writes its own files
+    jobs = [('stats', None, None)]
+    jobs += [('trend', indicator, None) for indicator in indicators]
+    jobs += [('choropleth', indicator, int(year)) for indicator in indicators for year in years]
+    if len(cluster_indicators) >= 2:
+        jobs += [('cluster', None, int(year)) for year in years]
+    return jobs
+
+
+def job_id(job):
+    kind, indicator, year = job
+    return '/'.join(str(part) for part in (kind, indicator, year) if part is not None)
+
+
+def load_manifest(output_dir):
+    path = Path(output_dir) / MANIFEST_FILE
+    if not path.exists():
+        return {'version': None, 'options': None, 'jobs': {}, 'failed': {}}
+    return json.loads(path.read_text())
+
+
+def save_manifest(output_dir, manifest):
+    # Replace atomically so an interrupted run never leaves a truncated manifest behind
+    path = Path(output_dir) / MANIFEST_FILE
+    tmp = path.with_name(f"{path.name}.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(tmp, path)
+
+
+def is_done(manifest, output_dir, key):
+    entry = manifest['jobs'].get(key)
+    return entry is not None and all((Path(output_dir) / output).exists() for output in entry['outputs'])
+
+
+def _init_worker(data_path, options):
+    from analytics import Analytics
+    from shared_store import attach_store
+    from visualizations import Visualizations
+
+    # One BLAS thread per process; the pool already uses every core
+    _worker['threads'] = threadpool_limits(1)
+    _worker['store'] = attach_store(data_path)
+    _worker['analytics'] = Analytics()
+    _worker['viz'] = Visualizations()
+    _worker['options'] = options
+
+
+def _write_figure(fig, output_dir, name, formats):
+    outputs = []
+    for fmt in formats:
+        path = Path(output_dir) / 'figures' / f"{name}.{fmt}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == 'html':
+            # Load plotly.js from the CDN instead of inlining ~3 MB into every file
+            fig.write_html(path, include_plotlyjs='cdn')
+        else:
+            fig.write_json(path)
+        outputs.append(path.relative_to(output_dir).as_posix())
+    return outputs
+
+
+def _write_table(table, output_dir, name, formats):
+    outputs = []
+    for fmt in formats:
+        path = Path(output_dir) / 'tables' / f"{name}.{fmt}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == 'parquet':
+            table.to_parquet(path)
+        else:
+            table.to_csv(path)
+        outputs.append(path.relative_to(output_dir).as_posix())
+    return outputs
+
+
+def run_job(job):
+    from visualizations import figure_cache
+
+    kind, indicator, year = job
+    store, analytics, viz, options = _worker['store'], _worker['analytics'], _worker['viz'], _worker['options']
+    output_dir = options['output_dir']
+    start = time.perf_counter()
+
+    if kind == 'stats':
+        table = analytics.batch_inequality_stats(store, options['indicators'])
+        outputs = _write_table(table, output_dir, 'inequality_stats', options['table_formats'])
+    elif kind == 'trend':
+        table = analytics.batch_trend_analysis(store, [indicator], options['start_year'], options['end_year'])
+        outputs = _write_table(table.set_index('country'), output_dir, f"trend/{indicator}", options['table_formats'])
+    elif kind == 'choropleth':
+        fig = viz.create_choropleth_map(store, indicator, year, f"{indicator} ({year})")
+        outputs = _write_figure(fig, output_dir, f"choropleth/{indicator}/{year}", options['figure_formats'])
+    elif kind == 'cluster':
+        fig = viz.create_cluster_analysis(store, options['cluster_indicators'], year)
+        outputs = _write_figure(fig, output_dir, f"cluster/{year}", options['figure_formats'])
+    else:
+        raise ValueError(f"Unknown report job: {kind}")
+
+    # Every figure is written once, so keeping it in the memo cache only grows the worker
+    figure_cache.clear()
+    return {'outputs': outputs, 'seconds': round(time.perf_counter() - start, 4)}
+
+
+def build_report(output_dir, source='sample', indicators=None, start_year=None, end_year=None,
+                 cluster_indicators=None, figure_formats=('html', 'json'), table_formats=('parquet', 'csv'),
+                 max_workers=None, refresh_data=False, checkpoint_every=50):
+    from data_loader import DataLoader
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    data_path = output_dir / DATA_DIR
+    if refresh_data:
+        shutil.rmtree(data_path, ignore_errors=True)
+
+    # Load once and publish memory-mapped arrays; workers attach instead of reloading or unpickling
+    store = DataLoader().load_shared_data(data_path, source=source)
+    indicators = list(indicators or store.indicators)
+    cluster_indicators = list(cluster_indicators or [c for c in CLUSTER_INDICATORS if c in store.indicators])
+    years = [int(year) for year in store.years
+             if (start_year is None or year >= start_year) and (end_year is None or year <= end_year)]
+    if not years:
+        raise ValueError("No data in the requested year range")
+
+    options = {
+        'output_dir': str(output_dir),
+        'indicators': indicators,
+        'cluster_indicators': cluster_indicators,
+        'start_year': years[0],
+        'end_year': years[-1],
+        'figure_formats': list(figure_formats),
+        'table_formats': list(table_formats)
+    }
+    # Trend and stats tables span the whole selection, so outputs only carry over for the same data and options
+    manifest_options = {key: value for key, value in options.items() if key != 'output_dir'}
+    manifest = load_manifest(output_dir)
+    if manifest['version'] != store.version or manifest.get('options') != manifest_options:
+        manifest = {'version': store.version, 'options': manifest_options, 'jobs': {}, 'failed': {}}
+    manifest['failed'] = {}
+
+    jobs = [job for job in build_jobs(indicators, years, cluster_indicators)
+            if not is_done(manifest, output_dir, job_id(job))]
+
+    completed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(str(data_path), options)) as executor:
+            futures = {executor.submit(run_job, job): job_id(job) for job in jobs}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    manifest['jobs'][key] = future.result()
+                except Exception as exc:
+                    manifest['failed'][key] = repr(exc)
+                completed += 1
+                if completed % checkpoint_every == 0:
+                    save_manifest(output_dir, manifest)
+    finally:
+        save_manifest(output_dir, manifest)
+    return manifest, completed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render every chart and table of the dashboard to static files")
+    parser.add_argument('output_dir')
+    parser.add_argument('--source', default='sample', choices=['sample', 'world_bank', 'wdi'])
+    parser.add_argument('--indicators', nargs='*', help="Indicator columns to export (default: all)")
+    parser.add_argument('--cluster-indicators', nargs='*', help="Indicators used for the yearly cluster plots")
+    parser.add_argument('--start-year', type=int)
+    parser.add_argument('--end-year', type=int)
+    parser.add_argument('--figure-formats', nargs='+', default=['html', 'json'], choices=['html', 'json'])
+    parser.add_argument('--table-formats', nargs='+', default=['parquet', 'csv'], choices=['parquet', 'csv'])
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('--refresh-data', action='store_true',
+                        help="Reload the dataset instead of reusing the copy from a previous run")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    manifest, completed = build_report(
+        args.output_dir, args.source, args.indicators, args.start_year, args.end_year, args.cluster_indicators,
+        args.figure_formats, args.table_formats, args.workers, args.refresh_data
+    )
+    print(f"{completed} jobs run in {time.perf_counter() - start:.1f}s; "
+          f"{len(manifest['jobs'])} done, {len(manifest['failed'])} failed")
+    for key, error in sorted(manifest['failed'].items()):
+        print(f"  {key}: {error}")
+    return 1 if manifest['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
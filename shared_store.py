@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_store import DataStore
+
+META_FILE = 'meta.json'
+
+
+def read_meta(path):
+    try:
+        return json.loads((Path(path) / META_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def shared_generation(path):
+    meta = read_meta(path)
+    return meta.get('generation', 0) if meta else -1
+
+
+def is_current(meta, source=None, generation=None):
+    if meta is None or meta.get('source') != source:
+        return False
+    return generation is None or meta.get('generation', 0) >= generation
+
+
+def publish_store(store, path, source=None, generation=0):
+    # Write into a private directory, then rename it into place so readers never see a partial dataset
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    staging.mkdir()
+
+    frame = store.frame
+    np.save(staging / 'values.npy', np.ascontiguousarray(store.values))
+    np.save(staging / 'dates.npy', frame['date'].to_numpy())
+    np.save(staging / 'country.npy', frame['country'].cat.codes.to_numpy())
+    np.save(staging / 'iso_codes.npy', frame['countryiso3code'].cat.codes.to_numpy())
+    # A complete grid is a reshaped view of values.npy; otherwise the (country, year, indicator) layout is
+    # published too, so panel readers map it instead of copying
+    if not store.complete_grid:
+        np.save(staging / 'panel.npy', store.panel)
+    meta = {
+        'indicators': store.indicators,
+        'domains': store.domains,
+        'countries': [str(c) for c in frame['country'].cat.categories],
+        'iso_codes': [str(c) for c in frame['countryiso3code'].cat.categories],
+        'version': store.version,
+        'source': source,
+        'generation': generation,
+        'created': time.time()
+    }
+    (staging / META_FILE).write_text(json.dumps(meta))
+
+    if path.exists():
+        # Processes still attached to the old generation keep their mappings after the files are unlinked
+        retired = path.with_name(f".{path.name}.{uuid.uuid4().hex}.old")
+        os.rename(path, retired)
+        os.rename(staging, path)
+        shutil.rmtree(retired, ignore_errors=True)
+    else:
+        os.rename(staging, path)
+    return path
+
+
+def attach_store(path):
+    path = Path(path)
+    meta = json.loads((path / META_FILE).read_text())
+    values = np.load(path / 'values.npy', mmap_mode='r')
+    dates = np.load(path / 'dates.npy', mmap_mode='r')
+    country = pd.Categorical.from_codes(np.load(path / 'country.npy', mmap_mode='r'), meta['countries'])
+    iso_codes = pd.Categorical.from_codes(np.load(path / 'iso_codes.npy', mmap_mode='r'), meta['iso_codes'])
+    panel = np.load(path / 'panel.npy', mmap_mode='r') if (path / 'panel.npy').exists() else None
+    return DataStore.from_arrays(values, dates, country, iso_codes, meta['indicators'], meta['domains'], meta['version'],
+                                 panel=panel)
+
+
+def is_published(path):
+    return (Path(path) / META_FILE).exists()
+
+
+def load_shared_store(path, build, source=None, generation=None, timeout=300, poll_interval=0.2):
+    # The first process to take the lock builds and publishes; the others wait and attach read-only.
+    # A dataset from another source, or older than the requested generation, is rebuilt and replaced.
+    path = Path(path)
+    lock_path = path.with_name(f"{path.name}.lock")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    deadline = time.time() + timeout
+    while True:
+        if is_current(read_meta(path), source, generation):
+            try:
+                return attach_store(path)
+            except FileNotFoundError:
+                # Replaced by a newer generation between the check and the attach
+                continue
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # Break locks left behind by a builder that died
+            try:
+                if time.time() - lock_path.stat().st_mtime > timeout:
+                    lock_path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
+            if time.time() > deadline:
+                raise TimeoutError(f"Timed out waiting for shared dataset at {path}")
+            time.sleep(poll_interval)
+            continue
+        try:
+            os.close(fd)
+            meta = read_meta(path)
+            if not is_current(meta, source, generation):
+                next_generation = max(generation or 0, meta.get('generation', 0) + 1 if meta else 0)
+                publish_store(build(), path, source, next_generation)
+        finally:
+            lock_path.unlink(missing_ok=True)
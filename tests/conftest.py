@@ -0,0 +1,26 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_frame(indicators, n_countries=30, years=range(1995, 2016), values=None, missing=0.0, seed=0,
+               dtype=np.float64):
+    # Long format, one row per country-year; values(rng, shape, years) returns a (country, year, indicator) cube
+    rng = np.random.default_rng(seed)
+    years = np.asarray(list(years))
+    width = max(2, len(str(n_countries - 1)))
+    frame = pd.DataFrame({
+        'country': np.repeat([f"Country {i:0{width}d}" for i in range(n_countries)], len(years)),
+        'countryiso3code': np.repeat([f"C{i:0{width}d}" for i in range(n_countries)], len(years)),
+        'date': np.tile(years, n_countries)
+    })
+    shape = (n_countries, len(years), len(indicators))
+    cube = rng.uniform(1, 100, size=shape) if values is None else values(rng, shape, years)
+    cube = np.array(np.broadcast_to(cube, shape), dtype=dtype).reshape(-1, len(indicators))
+    if missing:
+        cube[rng.random(cube.shape) < missing] = np.nan
+    return pd.concat([frame, pd.DataFrame(cube, columns=list(indicators))], axis=1)
@@ -0,0 +1,56 @@
+import numpy as np
+
+from analytics import Analytics
+from conftest import make_frame
+from data_store import DataStore
+
+INDICATORS = ['gdp_per_capita', 'life_expectancy']
+
+
+def encoded_values(rng, shape, years):
+    # Each value encodes its country and year, so every lag can be checked by hand
+    country = np.arange(shape[0])[:, None]
+    gdp = (years[None, :] - 1990) * 10.0 + country
+    life = (shape[0] - country) + years[None, :] % 2
+    return np.stack([gdp, life], axis=-1)
+
+
+def make_gapped_frame(years=(2000, 2001, 2002, 2005, 2006, 2010)):
+    return make_frame(INDICATORS, n_countries=6, years=years, values=encoded_values)
+
+
+def test_panel_tables_lag_by_calendar_year():
+    frame = make_gapped_frame()
+    tables = Analytics().build_panel_tables(DataStore(frame), INDICATORS, window=3)
+    panel = tables['panel']
+
+    gdp = panel.loc['gdp_per_capita'].set_index(['country', 'date'])
+    # 2005 - 3 = 2002 exists; 2006 - 3 = 2003 does not, so that CAGR is undefined
+    start, end = gdp.loc[('Country 01', 2002), 'value'], gdp.loc[('Country 01', 2005), 'value']
+    np.testing.assert_allclose(gdp.loc[('Country 01', 2005), 'cagr'], (end / start) ** (1 / 3) - 1)
+    assert np.isnan(gdp.loc[('Country 01', 2006), 'cagr'])
+    # The rolling mean covers 2008-2010, so only the 2010 value is in the window
+    np.testing.assert_allclose(gdp.loc[('Country 01', 2010), 'rolling_mean'], gdp.loc[('Country 01', 2010), 'value'])
+
+    # Rank changes only compare with the calendar year before
+    life = panel.loc['life_expectancy'].set_index(['country', 'date'])
+    assert life.loc[('Country 00', 2001), 'rank_change'] == 0
+    assert np.isnan(life.loc[('Country 00', 2005), 'rank_change'])
+    assert life.loc[('Country 00', 2006), 'rank_change'] == 0
+
+
+def test_movers_and_history_slice_the_indexed_table():
+    frame = make_gapped_frame()
+    analytics = Analytics()
+    tables = analytics.build_panel_tables(DataStore(frame), INDICATORS, window=3)
+    long = tables['panel']
+
+    movers = analytics.get_biggest_movers(tables, 'gdp_per_capita', 2001, n=2)
+    expected = long[(long['indicator'] == 'gdp_per_capita') & (long['date'] == 2001)]
+    assert len(movers['risers']) == 2
+    assert set(movers['risers']['country']) <= set(expected['country'])
+
+    history = analytics.get_rank_history(tables, 'life_expectancy', ['Country 02', 'Country 04'], 2001, 2006)
+    assert sorted(history['date'].unique()) == [2001, 2002, 2005, 2006]
+    assert set(history['country']) == {'Country 02', 'Country 04'}
+    assert {'date', 'rank', 'country'} <= set(history.columns)
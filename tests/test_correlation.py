@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from conftest import make_frame
+from correlation import CorrelationEngine, correlation_pvalues
+
+INDICATORS = ['a', 'b', 'c', 'd']
+
+
+def correlated_values(rng, shape, years):
+    base = rng.normal(size=shape[:2] + (1,))
+    values = base * np.arange(shape[2]) + rng.normal(size=shape) ** 3
+    # Rounding leaves ties, so tied ranks are exercised as well
+    return np.round(values, 1)
+
+
+def make_sparse_frame():
+    return make_frame(INDICATORS, n_countries=40, years=range(2000, 2004), values=correlated_values, missing=0.3,
+                      seed=1)
+
+
+@pytest.mark.parametrize('method', ['pearson', 'spearman'])
+def test_pairwise_complete_matches_pandas_on_sparse_data(method):
+    frame = make_sparse_frame()
+    result = CorrelationEngine().compute(frame, INDICATORS, method)
+    for year, year_frame in frame.groupby('date'):
+        expected = year_frame[INDICATORS].corr(method=method)
+        np.testing.assert_allclose(result.matrix(year).to_numpy(), expected.to_numpy(), rtol=1e-5, atol=1e-6)
+
+
+def test_diagonal_has_no_p_values():
+    result = CorrelationEngine().compute(make_sparse_frame(), INDICATORS)
+    p_values = result.pvalues(2001).to_numpy()
+    assert np.isnan(np.diag(p_values)).all()
+    assert not np.isnan(p_values[np.triu_indices(len(INDICATORS), k=1)]).any()
+
+
+def test_p_values_match_scipy_t_distribution():
+    from scipy import stats
+
+    rng = np.random.default_rng(2)
+    n = rng.integers(3, 260, size=(20, 5, 5))
+    corr = rng.uniform(-0.99, 0.99, size=n.shape)
+    dof = n - 2
+    expected = 2 * stats.t.sf(np.abs(corr * np.sqrt(dof / (1 - corr ** 2))), dof)
+    off_diagonal = ~np.eye(5, dtype=bool)
+    np.testing.assert_allclose(correlation_pvalues(corr, n)[:, off_diagonal], expected[:, off_diagonal], atol=1e-12)
+
+
+def test_carry_over_matches_a_fresh_compute_and_keeps_untouched_years():
+    from data_loader import DataLoader
+    from data_store import DataStore
+
+    frame = make_sparse_frame()
+    new_frame = frame.copy()
+    new_frame.loc[(new_frame['country'] == 'Country 07') & (new_frame['date'] == 2002), 'b'] = 99.0
+    old_store, new_store = DataStore(frame), DataStore(new_frame)
+
+    engine = CorrelationEngine()
+    old = engine.compute(old_store, INDICATORS, 'spearman')
+    changes = DataLoader().diff_snapshots(old_store, new_store)
+    engine.carry_over(old_store, new_store, changes)
+    misses = engine.results.misses
+    carried = engine.compute(new_store, INDICATORS, 'spearman')
+    assert engine.results.misses == misses
+
+    fresh = CorrelationEngine().compute(new_store, INDICATORS, 'spearman')
+    for year in (2000, 2001, 2002, 2003):
+        np.testing.assert_allclose(carried.matrix(year).to_numpy(), fresh.matrix(year).to_numpy())
+    assert not np.allclose(carried.matrix(2002).to_numpy(), old.matrix(2002).to_numpy())
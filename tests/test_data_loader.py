@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+from conftest import make_frame
+from data_loader import DataLoader
+from data_store import DataStore
+from shared_store import attach_store, shared_generation
+from wdi_bulk import ANOMALIES_FILE
+
+INDICATORS = ['gdp_per_capita', 'life_expectancy']
+
+
+class FrameLoader(DataLoader):
+    # Serves a fixed frame as the 'sample' source, so refresh sees exactly the edits a test makes
+    def __init__(self, frame, **kwargs):
+        super().__init__(**kwargs)
+        self.frame = frame
+
+    def create_sample_data(self):
+        return self.frame.copy()
+
+
+def edited(frame):
+    frame = frame.copy()
+    frame.loc[(frame['country'] == 'Country 03') & (frame['date'] == 2001), 'gdp_per_capita'] = -1.0
+    frame.loc[(frame['country'] == 'Country 05') & (frame['date'] == 2003), 'life_expectancy'] = np.nan
+    return frame
+
+
+def test_diff_snapshots_lists_changed_cells_only():
+    frame = make_frame(INDICATORS, n_countries=8, years=range(2000, 2005))
+    changes = DataLoader().diff_snapshots(DataStore(frame), DataStore(edited(frame)))
+
+    assert list(changes[['indicator', 'country', 'date']].itertuples(index=False, name=None)) == [
+        ('gdp_per_capita', 'Country 03', 2001), ('life_expectancy', 'Country 05', 2003)
+    ]
+    assert changes['new_value'].iloc[0] == -1.0
+    assert np.isnan(changes['new_value'].iloc[1]) and not np.isnan(changes['old_value'].iloc[1])
+
+
+def test_refresh_republishes_only_when_data_changed(tmp_path):
+    frame = make_frame(INDICATORS, n_countries=8, years=range(2000, 2005))
+    snapshot, shared = tmp_path / 'snapshot.parquet', tmp_path / 'shared'
+
+    store, changes = FrameLoader(frame).refresh(snapshot, 'sample', shared)
+    # With no snapshot yet every observed cell counts as new
+    assert len(changes) == frame[INDICATORS].notna().sum().sum()
+    first = shared_generation(shared)
+
+    store, changes = FrameLoader(edited(frame)).refresh(snapshot, 'sample', shared)
+    assert len(changes) == 2
+    assert shared_generation(shared) == first + 1
+    attached = attach_store(shared)
+    assert attached.version == store.version
+    assert (attached.year(2001).set_index('country').loc['Country 03', 'gdp_per_capita']) == -1.0
+
+    _, changes = FrameLoader(edited(frame)).refresh(snapshot, 'sample', shared)
+    assert changes.empty
+    assert shared_generation(shared) == first + 1
+
+
+def test_load_data_screens_for_anomalies():
+    frame = make_frame(INDICATORS, n_countries=8, years=range(2000, 2005))
+    frame.loc[(frame['country'] == 'Country 02') & (frame['date'] == 2002), 'gdp_per_capita'] = 1e9
+    loader = FrameLoader(frame)
+    loader.load_data('sample')
+
+    flagged = loader.anomalies[loader.anomalies['kind'] == 'level']
+    assert ('gdp_per_capita', 'Country 02', 2002) in set(
+        flagged[['indicator', 'country', 'date']].itertuples(index=False, name=None)
+    )
+    assert flagged['value'].max() == 1e9
+
+
+def test_ingest_wdi_bulk_writes_flagged_cells(tmp_path):
+    rng = np.random.default_rng(0)
+    years = [str(year) for year in range(2000, 2005)]
+    rows = pd.DataFrame(rng.uniform(1000, 2000, (8, len(years))), columns=years)
+    rows.loc[2, '2002'] = 1e9
+    rows.insert(0, 'Country Name', [f'Country {i:02d}' for i in range(8)])
+    rows.insert(1, 'Country Code', [f'C{i:02d}' for i in range(8)])
+    rows.insert(2, 'Indicator Name', 'GDP per capita, PPP (current international $)')
+    rows.insert(3, 'Indicator Code', 'NY.GDP.PCAP.PP.CD')
+    rows.to_csv(tmp_path / 'WDICSV.csv', index=False)
+
+    loader = DataLoader()
+    output_dir = loader.ingest_wdi_bulk(tmp_path / 'WDICSV.csv', tmp_path / 'wdi')
+
+    written = pd.read_parquet(output_dir / ANOMALIES_FILE)
+    assert len(written) == len(loader.anomalies)
+    level = written[written['kind'] == 'level']
+    assert list(level[['country', 'date']].itertuples(index=False, name=None)) == [('Country 02', 2002)]
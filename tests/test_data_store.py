@@ -0,0 +1,42 @@
+import numpy as np
+
+from conftest import make_frame
+from data_store import DataStore
+from shared_store import attach_store, publish_store
+
+INDICATORS = ['a', 'b', 'c', 'd']
+
+
+def expected_panel(frame, indicators):
+    # Reference (country, year, indicator) layout built straight from the long frame
+    countries, years = sorted(frame['country'].unique()), sorted(frame['date'].unique())
+    panel = np.full((len(countries), len(years), len(indicators)), np.nan, dtype=np.float32)
+    c = np.searchsorted(countries, frame['country'])
+    y = np.searchsorted(years, frame['date'])
+    panel[c, y, :] = frame[indicators].to_numpy(dtype=np.float32)
+    return panel
+
+
+def test_complete_grid_panel_is_a_view_of_the_values():
+    frame = make_frame(INDICATORS, n_countries=12, years=range(2000, 2008), missing=0.2)
+    store = DataStore(frame.sample(frac=1, random_state=0))
+    assert store.complete_grid
+    assert np.shares_memory(store.panel, store.values)
+    np.testing.assert_array_equal(store.panel, expected_panel(frame, INDICATORS))
+    _, _, panel = store.to_panel(['d', 'b'])
+    np.testing.assert_array_equal(panel, expected_panel(frame, ['d', 'b']))
+
+
+def test_sparse_rows_build_only_the_requested_columns(tmp_path):
+    frame = make_frame(INDICATORS, n_countries=12, years=range(2000, 2008))
+    # Missing country-years, as the WDI ingestion drops all-empty rows
+    frame = frame.drop(index=[3, 17, 40]).reset_index(drop=True)
+    store = DataStore(frame)
+    assert not store.complete_grid
+    _, _, panel = store.to_panel(['b', 'c'])
+    assert panel.shape == (12, 8, 2)
+    np.testing.assert_array_equal(panel, expected_panel(frame, ['b', 'c']))
+
+    publish_store(store, tmp_path / 'shared')
+    _, _, attached = attach_store(tmp_path / 'shared').to_panel(['b', 'c'])
+    np.testing.assert_array_equal(attached, panel)
@@ -0,0 +1,16 @@
+from instrumentation import Instrumentation
+
+
+def test_prometheus_output_has_one_header_per_family_and_escapes_labels():
+    metrics = Instrumentation(enabled=True)
+    metrics.increment('cache_hits', cache='plain')
+    metrics.increment('cache_hits', cache='quote " and \\ slash')
+    metrics.observe('span_seconds', 0.02, span='render.map')
+    metrics.observe('span_seconds', 0.3, span='render.data')
+    lines = metrics.to_prometheus(prefix='test').splitlines()
+
+    assert lines.count('# TYPE test_cache_hits_total counter') == 1
+    assert lines.count('# TYPE test_span_seconds histogram') == 1
+    assert sum(line.startswith('# HELP ') for line in lines) == 2
+    assert 'test_cache_hits_total{cache="quote \\" and \\\\ slash"} 1' in lines
+    assert 'test_span_seconds_count{span="render.map"} 1' in lines
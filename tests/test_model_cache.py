@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from analytics import Analytics
+from conftest import make_frame
+from data_loader import DataLoader
+from data_store import DataStore
+from model_cache import ModelCache
+from visualizations import Visualizations
+
+INDICATORS = ['gdp_per_capita', 'life_expectancy', 'literacy_rate']
+
+
+
+def test_carry_over_realigns_rows_when_layout_shifts():
+    old_frame = make_frame(INDICATORS)
+    # One extra country-year in 2000 shifts the row position of every later year
+    extra = pd.DataFrame({'country': ['Newland'], 'countryiso3code': ['NEW'], 'date': [2000],
+                          **{indicator: [50.0] for indicator in INDICATORS}})
+    new_frame = pd.concat([old_frame, extra], ignore_index=True)
+    old_store, new_store = DataStore(old_frame), DataStore(new_frame)
+    assert old_store.year(2010).index[0] != new_store.year(2010).index[0]
+
+    cache = ModelCache()
+    analytics = Analytics(model_cache=cache)
+    viz = Visualizations(model_cache=cache)
+    old_pca, _ = analytics.perform_pca_analysis(old_store, INDICATORS, 2010)
+    cache.fit_kmeans(old_store, INDICATORS, 2010)
+
+    changes = DataLoader().diff_snapshots(old_store, new_store)
+    assert set(changes['date']) == {2000}
+    analytics.apply_changes(old_store, new_store, changes)
+
+    misses = cache.models.misses
+    new_pca, _ = analytics.perform_pca_analysis(new_store, INDICATORS, 2010)
+    fig = viz.create_cluster_analysis(new_store, INDICATORS, 2010)
+    assert cache.models.misses == misses
+
+    assert list(new_pca['country']) == list(old_pca['country'])
+    np.testing.assert_allclose(new_pca['PC1'], old_pca['PC1'])
+    assert sorted(point for trace in fig.data for point in trace.hovertext) == sorted(old_pca['country'])
+
+
+def test_single_year_kmeans_ignores_what_else_is_cached():
+    store = DataStore(make_frame(INDICATORS, n_countries=80, seed=3))
+    cold = ModelCache().fit_kmeans(store, INDICATORS, 2001)
+
+    cache = ModelCache()
+    cache.fit_kmeans(store, INDICATORS, 2000)
+    after_neighbour = cache.fit_kmeans(store, INDICATORS, 2001)
+    np.testing.assert_array_equal(after_neighbour[1], cold[1])
+    np.testing.assert_allclose(after_neighbour[2], cold[2])
+
+
+def test_all_year_clustering_does_not_depend_on_cached_single_fits():
+    store = DataStore(make_frame(INDICATORS, n_countries=80, seed=3))
+    expected = ModelCache().fit_all_years(store, INDICATORS)
+
+    cache = ModelCache()
+    for year in (2003, 2010):
+        cache.fit_kmeans(store, INDICATORS, year)
+    pd.testing.assert_frame_equal(cache.fit_all_years(store, INDICATORS), expected)
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from report import build_report, load_manifest
+
+
+def test_rerun_with_other_options_rebuilds_range_tables(tmp_path):
+    kwargs = dict(indicators=['gdp_per_capita'], cluster_indicators=['gdp_per_capita'], figure_formats=['json'],
+                  table_formats=['csv'], max_workers=1)
+    manifest, completed = build_report(tmp_path, start_year=2000, end_year=2005, **kwargs)
+    assert not manifest['failed'] and completed == len(manifest['jobs'])
+
+    # Same data, wider range: the trend table must cover the new range rather than being reused
+    manifest, completed = build_report(tmp_path, start_year=2000, end_year=2010, **kwargs)
+    assert not manifest['failed'] and completed == len(manifest['jobs'])
+    assert manifest['options']['end_year'] == 2010
+    trend = pd.read_csv(tmp_path / 'tables' / 'trend' / 'gdp_per_capita.csv')
+    assert trend['observations'].max() == 11
+
+    # Identical options reuse every output
+    _, completed = build_report(tmp_path, start_year=2000, end_year=2010, **kwargs)
+    assert completed == 0
+    assert load_manifest(tmp_path)['options']['indicators'] == ['gdp_per_capita']
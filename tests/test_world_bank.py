@@ -0,0 +1,107 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from data_loader import DataLoader
+
+COUNTRIES = [('United States', 'USA'), ('Brazil', 'BRA'), ('India', 'IND')]
+
+
+def records(code, years):
+    return [{'indicator': {'id': code}, 'country': {'id': iso[:2], 'value': name}, 'countryiso3code': iso,
+             'date': str(year), 'value': float(i * 100 + year - 2000)}
+            for i, (name, iso) in enumerate(COUNTRIES) for year in years]
+
+
+class StubWorldBank(BaseHTTPRequestHandler):
+    # Mimics /country/all/indicator/<code>: paged JSON, the API's error payload, and transient 503s
+    failures = {}
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        code = url.path.rsplit('/', 1)[-1]
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.requests.append((code, int(query['page'])))
+        if self.failures.get(code, 0) > 0:
+            self.failures[code] -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        if code == 'BAD':
+            payload = [{'message': [{'id': '120', 'key': 'Invalid value', 'value': 'The provided parameter value is not valid'}]}]
+        else:
+            start, end = (int(year) for year in query['date'].split(':'))
+            rows = [] if code == 'EMPTY' else records(code, range(start, end + 1))
+            per_page, page = int(query['per_page']), int(query['page'])
+            pages = max(1, -(-len(rows) // per_page))
+            payload = [{'page': page, 'pages': pages, 'per_page': per_page, 'total': len(rows)},
+                       rows[(page - 1) * per_page:page * per_page] or None]
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubWorldBank.failures, StubWorldBank.requests = {}, []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubWorldBank)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_pages_are_fetched_and_concatenated(stub_server):
+    loader = DataLoader(base_url=stub_server, backoff=0)
+    data = loader.fetch_all_indicators(['PAGED', 'OTHER'], start_year=2000, end_year=2004, per_page=4)
+
+    # 3 countries x 5 years over pages of 4 rows
+    assert sorted(page for code, page in StubWorldBank.requests if code == 'PAGED') == [1, 2, 3, 4]
+    assert len(data) == 30
+    assert list(data['indicator'].unique()) == ['PAGED', 'OTHER']
+    assert set(data['country']) == {name for name, _ in COUNTRIES}
+    single = loader.fetch_world_bank_data('PAGED', start_year=2000, end_year=2004, per_page=4)
+    assert len(single) == 15 and single['value'].notna().all()
+
+
+def test_error_payload_raises_with_the_api_message(stub_server):
+    loader = DataLoader(base_url=stub_server, backoff=0)
+    with pytest.raises(ValueError, match='Invalid value'):
+        loader.fetch_all_indicators(['BAD'], start_year=2000, end_year=2001)
+
+
+def test_transient_errors_are_retried(stub_server):
+    StubWorldBank.failures = {'FLAKY': 2}
+    data = DataLoader(base_url=stub_server, retries=3, backoff=0).fetch_world_bank_data('FLAKY', 2000, 2001)
+    assert len(data) == 6
+    assert StubWorldBank.requests.count(('FLAKY', 1)) == 3
+
+
+def test_retries_give_up_after_the_limit(stub_server):
+    StubWorldBank.failures = {'DOWN': 10}
+    with pytest.raises(requests.exceptions.RetryError):
+        DataLoader(base_url=stub_server, retries=2, backoff=0).fetch_world_bank_data('DOWN', 2000, 2001)
+    assert StubWorldBank.requests.count(('DOWN', 1)) == 3
+
+
+def test_empty_indicators_are_cached_and_return_an_empty_frame(stub_server, tmp_path):
+    loader = DataLoader(base_url=stub_server, backoff=0, cache_dir=tmp_path)
+    data = loader.fetch_all_indicators(['EMPTY'], start_year=2000, end_year=2001)
+    assert data.empty and list(data.columns) == ['country', 'countryiso3code', 'date', 'indicator', 'value']
+
+    mixed = loader.fetch_all_indicators(['EMPTY', 'PAGED'], start_year=2000, end_year=2001)
+    assert len(mixed) == 6
+    # EMPTY was served from the cache the second time; only PAGED went to the network
+    assert [code for code, _ in StubWorldBank.requests] == ['EMPTY', 'PAGED']
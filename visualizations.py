@@ -1,28 +1,88 @@
 import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
+from functools import wraps
+from correlation import default_correlation_engine
+from downsampling import downsample_series, grid_thin, percentile_bands
+from instrumentation import instrument_class, metrics
+from data_store import data_version, select_countries, select_year, to_frame, to_panel
+from model_cache import LRUCache, default_model_cache
 
+figure_cache = LRUCache(maxsize=256, name='figures')
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, np.ndarray, pd.Index)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def memoize_figure(method):
+    # Figures are shared between callers, so treat returned figures as read-only
+    @wraps(method)
+    def wrapper(self, data, *args, **kwargs):
+        key = (method.__name__, data_version(data), _freeze(args), _freeze(kwargs))
+        fig = figure_cache.get(key)
+        if fig is None:
+            fig = figure_cache.put(key, method(self, data, *args, **kwargs))
+            if metrics.enabled:
+                metrics.increment('figure_payload_bytes', len(fig.to_json()), figure=method.__name__)
+                metrics.increment('figures_built', figure=method.__name__)
+        return fig
+    return wrapper
+
+@instrument_class('viz')
 class Visualizations:
-    def __init__(self):
+    def __init__(self, model_cache=None, correlation_engine=None):
         self.color_palette = px.colors.qualitative.Set3
+        self.model_cache = model_cache or default_model_cache
+        self.correlation_engine = correlation_engine or default_correlation_engine
+        self.cluster_names = {0: 'Developed', 1: 'Emerging', 2: 'At-Risk'}
+        # Payload bounds for "all countries" views
+        self.max_series = 25
+        self.max_points_per_series = 200
+        self.max_scatter_points = 4000
+        self.webgl_threshold = 2000
     
+    @memoize_figure
     def create_time_series_chart(self, data, indicator, countries=None, title="Time Series Analysis"):
         if countries:
-            filtered_data = data[data['country'].isin(countries)]
+            filtered_data = select_countries(data, countries)
         else:
-            filtered_data = data
+            filtered_data = to_frame(data)
+            if filtered_data['country'].nunique() > self.max_series:
+                return self.create_percentile_band_chart(data, indicator, title=title)
         
+        filtered_data = downsample_series(filtered_data, 'date', indicator, 'country', self.max_points_per_series)
+        render_mode = 'webgl' if len(filtered_data) > self.webgl_threshold else 'auto'
         fig = px.line(filtered_data, x='date', y=indicator, color='country',
-                     title=title, template='plotly_white')
+                     title=title, template='plotly_white', render_mode=render_mode)
         fig.update_layout(height=500, showlegend=True)
         return fig
     
+    @memoize_figure
+    def create_percentile_band_chart(self, data, indicator, percentiles=(10, 50, 90), title="Time Series Analysis"):
+        low, mid, high = percentiles
+        bands = percentile_bands(to_frame(data), indicator, 'date', percentiles)
+        
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=bands['date'], y=bands[f"p{high}"], mode='lines',
+                                 line=dict(width=0), name=f"p{high}", showlegend=False))
+        fig.add_trace(go.Scatter(x=bands['date'], y=bands[f"p{low}"], mode='lines',
+                                 line=dict(width=0), fill='tonexty', fillcolor='rgba(99, 110, 250, 0.2)',
+                                 name=f"p{low}-p{high} range"))
+        fig.add_trace(go.Scatter(x=bands['date'], y=bands[f"p{mid}"], mode='lines',
+                                 line=dict(color='rgb(99, 110, 250)'), name=f"Median (p{mid})"))
+        fig.update_layout(title=title, template='plotly_white', height=500, showlegend=True,
+                          xaxis_title='date', yaxis_title=indicator)
+        return fig
+    
+    @memoize_figure
     def create_choropleth_map(self, data, indicator, year, title="Global Inequality Map"):
-        year_data = data[data['date'] == year]
+        year_data = select_year(data, year)
         
         fig = px.choropleth(year_data, 
                            locations='countryiso3code',
@@ -33,46 +93,97 @@ class Visualizations:
         fig.update_layout(height=600)
         return fig
     
+    @memoize_figure
+    def create_choropleth_animation(self, data, indicator, start_year, end_year, title="Global Inequality Map"):
+        countries, years, panel = to_panel(data, [indicator])
+        iso_codes = to_frame(data).drop_duplicates('country').set_index('country')['countryiso3code']
+        locations = [iso_codes.get(country) for country in countries]
+        in_range = (years >= start_year) & (years <= end_year)
+        years, values = years[in_range], panel[:, in_range, 0]
+        
+        # Geometry and colour scale are shared; each frame only carries its year's z-values
+        finite = values[~np.isnan(values)]
+        zmin, zmax = (float(finite.min()), float(finite.max())) if len(finite) else (0.0, 1.0)
+        z_by_year = [np.round(values[:, i], 4).tolist() for i in range(len(years))]
+        
+        fig = go.Figure(
+            data=[go.Choropleth(locations=locations, z=z_by_year[-1] if z_by_year else [],
+                                text=countries, hovertemplate='%{text}: %{z}<extra></extra>',
+                                colorscale='RdBu_r', zmin=zmin, zmax=zmax, zauto=False,
+                                colorbar=dict(title=indicator))],
+            frames=[go.Frame(data=[go.Choropleth(z=z)], traces=[0], name=str(year))
+                    for year, z in zip(years, z_by_year)]
+        )
+        
+        steps = [dict(method='animate', label=str(year),
+                      args=[[str(year)], dict(mode='immediate', frame=dict(duration=0, redraw=True), transition=dict(duration=0))])
+                 for year in years]
+        fig.update_layout(
+            title=f"{title} - {start_year} to {end_year}",
+            height=600,
+            sliders=[dict(active=len(steps) - 1, steps=steps, currentvalue=dict(prefix='Year: '))],
+            updatemenus=[dict(type='buttons', showactive=False, x=0, y=0, xanchor='right', yanchor='top',
+                              buttons=[dict(label='Play', method='animate',
+                                            args=[None, dict(frame=dict(duration=400, redraw=True), fromcurrent=True)])])]
+        )
+        return fig
+    
+    @memoize_figure
     def create_scatter_plot(self, data, x_col, y_col, color_col=None, year=None, title="Correlation Analysis"):
         if year:
-            plot_data = data[data['date'] == year]
+            plot_data = select_year(data, year)
         else:
-            plot_data = data
+            plot_data = to_frame(data)
+            if len(plot_data) > self.max_scatter_points:
+                plot_data = plot_data.iloc[grid_thin(plot_data[x_col], plot_data[y_col], self.max_scatter_points)]
         
+        render_mode = 'webgl' if len(plot_data) > self.webgl_threshold else 'auto'
         fig = px.scatter(plot_data, x=x_col, y=y_col, color=color_col,
-                        hover_name='country', title=title, template='plotly_white')
+                        hover_name='country', title=title, template='plotly_white',
+                        render_mode=render_mode)
         fig.update_layout(height=500)
+        if year and x_col != y_col:
+            r, n, p = self.correlation_engine.compute(data, [x_col, y_col]).pair(year, x_col, y_col)
+            fig.add_annotation(text=f"r = {r:.2f}, n = {n}, p = {p:.3g}", xref='paper', yref='paper',
+                               x=0.01, y=0.99, showarrow=False, align='left')
         return fig
     
+    @memoize_figure
     def create_bar_chart(self, data, x_col, y_col, color_col=None, title="Bar Chart Analysis"):
-        fig = px.bar(data, x=x_col, y=y_col, color=color_col,
+        fig = px.bar(to_frame(data), x=x_col, y=y_col, color=color_col,
                     title=title, template='plotly_white')
         fig.update_layout(height=500)
         return fig
     
-    def create_heatmap(self, data, indicators, year, title="Correlation Heatmap"):
-        year_data = data[data['date'] == year]
-        correlation_matrix = year_data[indicators].corr()
+    @memoize_figure
+    def create_heatmap(self, data, indicators, year, title="Correlation Heatmap", method='pearson'):
+        correlations = self.correlation_engine.compute(data, indicators, method)
+        correlation_matrix = correlations.matrix(year)
+        counts = correlations.counts(year).to_numpy()
+        p_values = correlations.pvalues(year).to_numpy()
+        
+        # Stars mark pairwise significance: * p<0.05, ** p<0.01, *** p<0.001
+        stars = np.select([p_values < 0.001, p_values < 0.01, p_values < 0.05], ['***', '**', '*'], default='')
+        text = np.where(np.isnan(correlation_matrix.to_numpy()), '', 
+                        np.char.add(np.char.mod('%.2f', correlation_matrix.to_numpy()), stars))
+        np.fill_diagonal(text, '')
         
         fig = px.imshow(correlation_matrix, 
-                       text_auto=True,
                        aspect="auto",
                        title=f"{title} - {year}",
-                       color_continuous_scale='RdBu_r')
+                       color_continuous_scale='RdBu_r',
+                       zmin=-1, zmax=1)
+        fig.update_traces(text=text, texttemplate='%{text}', customdata=np.dstack([counts, p_values]),
+                          hovertemplate='%{y} vs %{x}<br>r = %{z:.3f}<br>n = %{customdata[0]}<br>p = %{customdata[1]:.3g}<extra></extra>')
         fig.update_layout(height=500)
         return fig
     
+    @memoize_figure
     def create_cluster_analysis(self, data, indicators, year, n_clusters=3):
-        year_data = data[data['date'] == year].copy()
-        
-        scaler = StandardScaler()
-        scaled_data = scaler.fit_transform(year_data[indicators])
-        
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-        year_data['cluster'] = kmeans.fit_predict(scaled_data)
-        
-        cluster_names = {0: 'Developed', 1: 'Emerging', 2: 'At-Risk'}
-        year_data['cluster_name'] = year_data['cluster'].map(cluster_names)
+        index, labels, _ = self.model_cache.fit_kmeans(data, indicators, year, n_clusters)
+        year_data = select_year(data, year).loc[index].copy()
+        year_data['cluster'] = labels
+        year_data['cluster_name'] = year_data['cluster'].map(self.cluster_names)
         
         fig = px.scatter(year_data, x=indicators[0], y=indicators[1], 
                         color='cluster_name', hover_name='country',
@@ -80,25 +191,45 @@ class Visualizations:
         fig.update_layout(height=500)
         return fig
     
+    @memoize_figure
+    def create_cluster_animation(self, data, indicators, n_clusters=3):
+        clustered = self.model_cache.fit_all_years(data, indicators, n_clusters)
+        clustered['cluster_name'] = clustered['cluster'].map(self.cluster_names).fillna(clustered['cluster'].astype(str))
+        
+        fig = px.scatter(clustered, x=indicators[0], y=indicators[1],
+                        color='cluster_name', hover_name='country',
+                        animation_frame='date', animation_group='country',
+                        range_x=[clustered[indicators[0]].min(), clustered[indicators[0]].max()],
+                        range_y=[clustered[indicators[1]].min(), clustered[indicators[1]].max()],
+                        category_orders={'cluster_name': [self.cluster_names.get(i, str(i)) for i in range(n_clusters)]},
+                        title="Country Clustering Over Time")
+        fig.update_layout(height=500)
+        return fig
+    
+    @memoize_figure
     def create_comparison_chart(self, data, indicator, countries, years, title="Country Comparison"):
-        comparison_data = data[
-            (data['country'].isin(countries)) & 
-            (data['date'].isin(years))
-        ]
+        comparison_data = select_countries(data, countries)
+        comparison_data = comparison_data[comparison_data['date'].isin(years)]
         
         fig = px.bar(comparison_data, x='country', y=indicator, color='date',
                     title=title, template='plotly_white', barmode='group')
         fig.update_layout(height=500)
         return fig
     
+    @memoize_figure
     def create_progress_timeline(self, data, indicator, countries, start_year, end_year):
-        timeline_data = data[
-            (data['country'].isin(countries)) & 
-            (data['date'].between(start_year, end_year))
-        ]
+        timeline_data = select_countries(data, countries, start_year, end_year)
         
         fig = px.line(timeline_data, x='date', y=indicator, color='country',
                      title=f"Progress Timeline: {start_year} - {end_year}",
                      template='plotly_white')
         fig.update_layout(height=500)
-        return fig 
\ No newline at end of file
+        return fig
+    
+    @memoize_figure
+    def create_rank_chart(self, rank_history, title="Rank Over Time"):
+        fig = px.line(rank_history, x='date', y='rank', color='country', markers=True,
+                     title=title, template='plotly_white')
+        fig.update_yaxes(autorange='reversed', title='Rank (1 = highest)')
+        fig.update_layout(height=500)
+        return fig
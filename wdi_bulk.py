@@ -0,0 +1,116 @@
+import argparse
+import shutil
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+ID_COLUMNS = ['Country Name', 'Country Code', 'Indicator Code']
+ANOMALIES_FILE = 'anomalies.parquet'
+
+
+@contextmanager
+def open_wdi_csv(path, member=None):
+    # Accept either the extracted CSV or the bulk ZIP; ZIP members are streamed, never extracted
+    path = Path(path)
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            if member is None:
+                candidates = [
+                    name for name in archive.namelist()
+                    if name.lower().endswith('.csv') and 'series' not in name.lower()
+                    and 'country' not in name.lower() and 'footnote' not in name.lower()
+                ]
+                if not candidates:
+                    raise ValueError(f"No WDI data CSV found in {path}")
+                member = max(candidates, key=lambda name: archive.getinfo(name).file_size)
+            with archive.open(member) as f:
+                yield f
+    else:
+        with open(path, 'rb') as f:
+            yield f
+
+
+def iter_wdi_chunks(path, indicator_codes, chunksize=50000, member=None):
+    wanted = set(indicator_codes)
+    with open_wdi_csv(path, member) as f:
+        reader = pd.read_csv(f, chunksize=chunksize, dtype={'Country Name': str, 'Country Code': str, 'Indicator Code': str},
+                             encoding='utf-8-sig')
+        for chunk in reader:
+            chunk = chunk[chunk['Indicator Code'].isin(wanted)]
+            if chunk.empty:
+                continue
+            year_columns = [col for col in chunk.columns if str(col).strip().isdigit()]
+            long = chunk[ID_COLUMNS + year_columns].melt(id_vars=ID_COLUMNS, var_name='date', value_name='value')
+            long = long.dropna(subset=['value'])
+            long['date'] = long['date'].astype(int)
+            yield long
+
+
+def ingest_wdi_bulk(path, output_dir, indicator_columns, chunksize=50000, member=None):
+    # Stream the bulk export chunk by chunk, pivot each chunk to wide rows and stage them per year;
+    # each year partition is then compacted on its own so memory stays bounded by one year
+    output_dir = Path(output_dir)
+    staging = output_dir.with_name(f".{output_dir.name}.staging")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    for chunk_id, long in enumerate(iter_wdi_chunks(path, list(indicator_columns), chunksize, member)):
+        wide = long.pivot_table(index=['Country Name', 'Country Code', 'date'], columns='Indicator Code',
+                                values='value', aggfunc='first').reset_index()
+        for year, part in wide.groupby('date'):
+            year_dir = staging / f"date={year}"
+            year_dir.mkdir(exist_ok=True)
+            part.to_parquet(year_dir / f"chunk-{chunk_id:05d}.parquet", index=False)
+
+    columns = ['country', 'countryiso3code', 'date'] + list(indicator_columns.values())
+    shutil.rmtree(output_dir, ignore_errors=True)
+    output_dir.mkdir(parents=True)
+    for year_dir in sorted(staging.iterdir()):
+        parts = [pd.read_parquet(part) for part in sorted(year_dir.glob('*.parquet'))]
+        year_data = (
+            pd.concat(parts, ignore_index=True)
+            .groupby(['Country Name', 'Country Code', 'date'], sort=True)
+            .first()
+            .reset_index()
+            .rename(columns={'Country Name': 'country', 'Country Code': 'countryiso3code'})
+            .rename(columns=indicator_columns)
+            .reindex(columns=columns)
+        )
+        target = output_dir / year_dir.name
+        target.mkdir()
+        year_data.drop(columns='date').to_parquet(target / 'part-0.parquet', index=False)
+    shutil.rmtree(staging, ignore_errors=True)
+    return output_dir
+
+
+def read_wdi_parquet(output_dir, start_year=None, end_year=None):
+    frames = []
+    for year_dir in sorted(Path(output_dir).glob('date=*')):
+        year = int(year_dir.name.split('=', 1)[1])
+        if (start_year is not None and year < start_year) or (end_year is not None and year > end_year):
+            continue
+        frames.append(pd.read_parquet(year_dir / 'part-0.parquet').assign(date=year))
+    if not frames:
+        return pd.DataFrame()
+    data = pd.concat(frames, ignore_index=True)
+    return data[['country', 'countryiso3code', 'date'] + [c for c in data.columns if c not in ('country', 'countryiso3code', 'date')]]
+
+
+def main(argv=None):
+    from data_loader import DataLoader
+
+    parser = argparse.ArgumentParser(description="Convert the bulk WDI CSV/ZIP export into year-partitioned Parquet")
+    parser.add_argument('source', help="Path to WDI_CSV.zip or the extracted WDI data CSV")
+    parser.add_argument('output_dir')
+    parser.add_argument('--chunksize', type=int, default=50000)
+    args = parser.parse_args(argv)
+    loader = DataLoader()
+    output_dir = loader.ingest_wdi_bulk(args.source, args.output_dir, chunksize=args.chunksize)
+    if loader.anomalies is not None:
+        print(f"{len(loader.anomalies)} suspicious cells flagged; see {output_dir / ANOMALIES_FILE}")
+
+
+if __name__ == '__main__':
+    main()